@@ -378,16 +378,11 @@ def render_selectable_messages(messages_df: pd.DataFrame, key: str) -> pd.DataFr
     if messages_df is None or messages_df.empty:
         st.info("No messages to preview."); return pd.DataFrame()
 
-    base_cols = ["CustomerName","Phone","Message"]
-    cols = ["CustomerName","Phone","SalesAssociate","Message"] if "SalesAssociate" in messages_df.columns else base_cols
-
-    view_df = messages_df[cols].rename(columns={
-        "CustomerName":"Customer",
-        "Message":"SMS draft"
-    }).copy()
-
-    if "Send" not in view_df.columns:
-        view_df.insert(0, "Send", False)
+    cols = {"Send": False, "Customer": messages_df["CustomerName"], "Phone": messages_df["Phone"]}
+    if "SalesAssociate" in messages_df.columns:
+        cols["SalesAssociate"] = messages_df["SalesAssociate"]
+    cols["SMS draft"] = messages_df["Message"]
+    view_df = pd.DataFrame(cols)
 
     col_cfg = {
         "Send": st.column_config.CheckboxColumn("Send", default=False, width="small"),
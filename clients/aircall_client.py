@@ -1,6 +1,8 @@
 """Aircall SMS send wrapper — copied 1:1 from original app.py."""
 from config import *
+from core.utils import RatePacer
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 
 # ---- send_sms_via_aircall ----
@@ -20,6 +22,49 @@ def send_sms_via_aircall(phone: str, message: str, number_id: str = None) -> tup
     except Exception as e:
         return False, str(e)
 
+
+# ---- send_sms_batch ----
+
+# Aircall's public API allows 60 requests/minute per company, so sends are started at most
+# once a second (as the old per-row time.sleep(1) did) but their HTTP round-trips overlap.
+AIRCALL_SENDS_PER_SEC = 1.0
+
+def send_sms_batch(rows, number_id: str = None, *, max_workers: int = 5,
+                   per_sec: float = AIRCALL_SENDS_PER_SEC):
+    """
+    Send (phone, message) pairs through send_sms_via_aircall on a small thread pool.
+    Yields (phone, ok, msg) in completion order, so the caller can report each result
+    on the Streamlit thread as it lands.
+
+    Rows are submitted lazily with at most max_workers sends in flight, so if the caller
+    stops consuming (e.g. Streamlit's Stop/rerun raises inside the loop and the generator
+    is closed) only those already-started sends finish; the remaining rows are never sent.
+    """
+    pacer = RatePacer(per_sec)
+
+    def _send(phone, message):
+        pacer.wait()
+        return send_sms_via_aircall(phone, message, number_id)
+
+    pending_rows = iter(rows)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        in_flight = {}
+
+        def _top_up():
+            for phone, message in pending_rows:
+                in_flight[ex.submit(_send, phone, message)] = phone
+                if len(in_flight) >= max_workers:
+                    break
+
+        _top_up()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                phone = in_flight.pop(fut)
+                ok, msg = fut.result()
+                yield phone, ok, msg
+            _top_up()
+
 # ============ OpenAI drafting ============
 
 
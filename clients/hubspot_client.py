@@ -4,6 +4,10 @@ import requests
 import pandas as pd
 import streamlit as st
 import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
 
 # ---- hs_headers ----
 
@@ -45,11 +49,11 @@ def _hs_get(path: str, params: dict | None = None) -> dict:
     r.raise_for_status()
     return r.json()
 
-def _hs_post(path: str, payload: dict) -> dict:
-    """Low-level POST wrapper for HubSpot."""
+def _hs_post(path: str, payload: dict, session: requests.Session | None = None) -> dict:
+    """Low-level POST wrapper for HubSpot (pass `session` to reuse one connection across calls)."""
     base = "https://api.hubapi.com"
     url = f"{base}{path}"
-    r = requests.post(url, headers=_hs_headers(), json=payload, timeout=60)
+    r = (session or requests).post(url, headers=_hs_headers(), json=payload, timeout=60)
     r.raise_for_status()
     return r.json()
 
@@ -129,6 +133,9 @@ def _search_once(
     - We make a **shallow copy** of `payload` each page so the caller's dict is not
       mutated. We inject `"after"` into that per-page copy when continuing.
 
+    - All pages go through one `requests.Session`, so the keep-alive connection
+      (TCP + TLS) is set up once rather than once per page.
+
     Error handling
     --------------
     - Network/HTTP handling is delegated to `_hs_post`. If `_hs_post` raises on
@@ -139,42 +146,44 @@ def _search_once(
     after = None      # pagination cursor: HubSpot's "paging.next.after"
     fetched = 0       # total items collected so far (across pages)
 
-    while True:
-        # Work on a **shallow copy** so we do not mutate the caller's payload.
-        body = dict(payload)
+    # One pooled connection for every page of this search.
+    with requests.Session() as session:
+        while True:
+            # Work on a **shallow copy** so we do not mutate the caller's payload.
+            body = dict(payload)
 
-        # Determine a safe per-page limit. If the caller provided one, use it;
-        # otherwise default to 100. Then **clamp** so we do not exceed total_cap.
-        limit = int(body.get("limit", 100))
-        limit = min(limit, max(0, total_cap - fetched))  # if cap already reached, becomes 0
+            # Determine a safe per-page limit. If the caller provided one, use it;
+            # otherwise default to 100. Then **clamp** so we do not exceed total_cap.
+            limit = int(body.get("limit", 100))
+            limit = min(limit, max(0, total_cap - fetched))  # if cap already reached, becomes 0
 
-        # If nothing left to fetch (cap hit), stop before calling the API again.
-        if limit <= 0:
-            break
+            # If nothing left to fetch (cap hit), stop before calling the API again.
+            if limit <= 0:
+                break
 
-        body["limit"] = limit
+            body["limit"] = limit
 
-        # If we have a cursor from the previous page, include it to fetch the next page.
-        if after is not None:
-            body["after"] = after
+            # If we have a cursor from the previous page, include it to fetch the next page.
+            if after is not None:
+                body["after"] = after
 
-        # Perform the HTTP POST to HubSpot Search.
-        # `_hs_post` should add auth headers, serialize JSON, and raise/return on errors.
-        j = _hs_post(endpoint, body)
+            # Perform the HTTP POST to HubSpot Search.
+            # `_hs_post` should add auth headers, serialize JSON, and raise/return on errors.
+            j = _hs_post(endpoint, body, session=session)
 
-        # Pull this page's items (each item is a dict with keys like "id", "properties", etc.).
-        results = j.get("results", [])
-        out.extend(results)
-        fetched += len(results)
+            # Pull this page's items (each item is a dict with keys like "id", "properties", etc.).
+            results = j.get("results", [])
+            out.extend(results)
+            fetched += len(results)
 
-        # Prepare the cursor for the next loop iteration (if any).
-        after = j.get("paging", {}).get("next", {}).get("after")
+            # Prepare the cursor for the next loop iteration (if any).
+            after = j.get("paging", {}).get("next", {}).get("after")
 
-        # Exit conditions:
-        #  - no more cursor (no more pages), or
-        #  - we have met/exceeded the requested total_cap.
-        if not after or fetched >= total_cap:
-            break
+            # Exit conditions:
+            #  - no more cursor (no more pages), or
+            #  - we have met/exceeded the requested total_cap.
+            if not after or fetched >= total_cap:
+                break
 
     # Convert the accumulated raw items to a **flat** DataFrame:
     #  - keep "properties" dict as columns
@@ -189,6 +198,44 @@ def _search_once(
 
 # ---- hs_get_deal_property_options ----
 
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=8)
+def _fetch_deal_property_options(property_name: str) -> list[dict]:
+    """Live HubSpot lookup behind hs_get_deal_property_options; raises on failure."""
+    # Construct the HubSpot API endpoint for this specific deal property.
+    # Example final URL:
+    #   https://api.hubapi.com/crm/v3/properties/deals/customer_state
+    url = f"{HS_PROP_URL}/{property_name}"
+
+    # Perform a GET with standard auth headers.
+    # `archived=false` ensures we only receive currently-active options.
+    # Short timeout keeps the UI responsive on network issues.
+    r = requests.get(url, headers=hs_headers(), params={"archived": "false"}, timeout=8)
+
+    # Raise an HTTPError if HubSpot returns 4xx/5xx.
+    # This sends the caller to its RequestException handler.
+    r.raise_for_status()
+
+    # Parse the JSON payload.
+    data = r.json()
+
+    # HubSpot responds with an "options" array for enum/selection properties.
+    # If "options" is absent or None, we coerce to [] to simplify handling.
+    options = data.get("options", []) or []
+
+    out = []
+    for opt in options:
+        # Each option typically has:
+        # - "value": machine value written to the property
+        # - "label": human-friendly label (sometimes "displayValue" instead)
+        value = str(opt.get("value") or "").strip()
+        label = str(opt.get("label") or opt.get("displayValue") or value).strip()
+
+        # Only keep options with a non-empty value.
+        # If label is empty, fall back to value so the UI still shows something.
+        if value:
+            out.append({"label": label or value, "value": value})
+    return out
+
 def hs_get_deal_property_options(property_name: str) -> list[dict]:
     """
     Fetch selectable options for a HubSpot *deal* property, and return them as
@@ -250,39 +297,8 @@ def hs_get_deal_property_options(property_name: str) -> list[dict]:
     fallback_states = [{"label": s, "value": s} for s in ["VIC","NSW","QLD","SA","WA","TAS","NT","ACT"]]
 
     try:
-        # Construct the HubSpot API endpoint for this specific deal property.
-        # Example final URL:
-        #   https://api.hubapi.com/crm/v3/properties/deals/customer_state
-        url = f"{HS_PROP_URL}/{property_name}"
-
-        # Perform a GET with standard auth headers.
-        # `archived=false` ensures we only receive currently-active options.
-        # Short timeout keeps the UI responsive on network issues.
-        r = requests.get(url, headers=hs_headers(), params={"archived": "false"}, timeout=8)
-
-        # Raise an HTTPError if HubSpot returns 4xx/5xx.
-        # This sends us to the RequestException handler below.
-        r.raise_for_status()
-
-        # Parse the JSON payload.
-        data = r.json()
-
-        # HubSpot responds with an "options" array for enum/selection properties.
-        # If "options" is absent or None, we coerce to [] to simplify handling.
-        options = data.get("options", []) or []
-
-        out = []
-        for opt in options:
-            # Each option typically has:
-            # - "value": machine value written to the property
-            # - "label": human-friendly label (sometimes "displayValue" instead)
-            value = str(opt.get("value") or "").strip()
-            label = str(opt.get("label") or opt.get("displayValue") or value).strip()
-
-            # Only keep options with a non-empty value.
-            # If label is empty, fall back to value so the UI still shows something.
-            if value:
-                out.append({"label": label or value, "value": value})
+        # Cached for an hour (options rarely change); failures raise and are not cached.
+        out = _fetch_deal_property_options(property_name)
 
         # If HubSpot returned no usable options, fall back to AU states.
         return out or fallback_states
@@ -299,6 +315,24 @@ def hs_get_deal_property_options(property_name: str) -> list[dict]:
         st.info("Unexpected issue while fetching state options. Using default states.")
         return fallback_states
 
+
+# ---- hs_state_select_options ----
+
+def hs_state_select_options(property_name: str = "car_location_at_time_of_sale", default: str = "VIC"):
+    """
+    Everything the views' "Vehicle state" selectbox needs, built in one pass over the
+    (cached) property options: (labels, label_to_val, default_index, default_value).
+    default_index points at `default` if offered, else the first option; with no
+    options the labels are empty and default_value is "".
+    """
+    options = hs_get_deal_property_options(property_name) or []
+    labels = [o["label"] for o in options]
+    label_to_val = {o["label"]: o["value"] for o in options}
+    values = [o["value"] for o in options]
+    def_idx = values.index(default) if default in values else 0
+    def_val = values[def_idx] if values else ""
+    return labels, label_to_val, def_idx, def_val
+
 # --- update the sales associate name based on random allocation at the time of Test Drive reminders --- #
 
 def hs_update_ticket_owner_map(deal_to_email: dict[str, str]) -> tuple[int, int]:
@@ -499,15 +533,18 @@ def get_all_deal_ids_for_contacts(messages_df: pd.DataFrame, deals_df: pd.DataFr
     if messages_df is None or messages_df.empty or deals_df is None or deals_df.empty:
         return phone_to_deals
     
-    # Create a mapping of normalized phone to deal IDs
-    for _, msg_row in messages_df.iterrows():
-        phone = str(msg_row.get("Phone", "")).strip()
-        if not phone:
-            continue
-        
-        # Find all deals with this phone number
-        matching_deals = deals_df[deals_df["phone_norm"] == phone]["hs_object_id"].tolist()
-        phone_to_deals[phone] = [str(d) for d in matching_deals if d]
+    if "Phone" not in messages_df.columns:
+        return phone_to_deals
+    
+    # Build normalized phone -> deal IDs once (groups keep row order), then look up each message phone
+    ids = deals_df["hs_object_id"]
+    keep = ids.map(bool)
+    by_phone = ids[keep].astype(str).groupby(deals_df["phone_norm"][keep], sort=False).agg(list).to_dict()
+    
+    phones = messages_df["Phone"].map(str).str.strip()
+    for phone in phones.unique():
+        if phone:
+            phone_to_deals[phone] = list(by_phone.get(phone, ()))
     
     return phone_to_deals
 
@@ -554,10 +591,41 @@ def get_contact_ids_for_deal(deal_id):
 
 # ---- get_consolidated_notes_for_deal ----
 
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+def _format_contact_notes(notes, owner_name) -> list[str]:
+    """'[date] (owner) body' lines for a contact's note objects; owner_name maps owner id -> name."""
+    formatted = []
+    for note in notes:
+        props = note.get("properties", {})
+        body = props.get("hs_note_body", "")
+        timestamp = props.get("hs_timestamp") or props.get("hs_createdate", "")
+        owner_id = props.get("hubspot_owner_id")
+        
+        if body and body.strip():
+            # Clean HTML from body
+            clean_body = _HTML_TAG_RE.sub('', body).strip()
+            clean_body = clean_body.replace('&nbsp;', ' ').replace('&amp;', '&')
+            
+            if clean_body:
+                # Format timestamp
+                date_str = "Unknown Date"
+                if timestamp:
+                    try:
+                        from datetime import datetime
+                        if len(str(timestamp)) > 10:  # milliseconds
+                            dt = datetime.fromtimestamp(int(timestamp) / 1000)
+                        else:  # seconds
+                            dt = datetime.fromtimestamp(int(timestamp))
+                        date_str = dt.strftime("%Y-%m-%d %H:%M")
+                    except:
+                        date_str = str(timestamp)
+                
+                formatted.append(f"[{date_str}] ({owner_name(owner_id)}) {clean_body}")
+    return formatted
+
 def get_consolidated_notes_for_deal(deal_id):
     """Get all consolidated notes for a deal"""
-    headers = {"Authorization": f"Bearer {HUBSPOT_TOKEN}"}
-    
     contact_ids = get_contact_ids_for_deal(deal_id)
     
     if not contact_ids:
@@ -569,39 +637,7 @@ def get_consolidated_notes_for_deal(deal_id):
         note_ids = get_contact_note_ids(contact_id)
         
         if note_ids:
-            notes = get_notes_content(note_ids)
-            
-            for note in notes:
-                props = note.get("properties", {})
-                body = props.get("hs_note_body", "")
-                timestamp = props.get("hs_timestamp") or props.get("hs_createdate", "")
-                owner_id = props.get("hubspot_owner_id")
-                
-                if body and body.strip():
-                    # Clean HTML from body
-                    import re
-                    clean_body = re.sub(r'<[^>]+>', '', body).strip()
-                    clean_body = clean_body.replace('&nbsp;', ' ').replace('&amp;', '&')
-                    
-                    if clean_body:
-                        # Format timestamp
-                        date_str = "Unknown Date"
-                        if timestamp:
-                            try:
-                                from datetime import datetime
-                                if len(str(timestamp)) > 10:  # milliseconds
-                                    dt = datetime.fromtimestamp(int(timestamp) / 1000)
-                                else:  # seconds
-                                    dt = datetime.fromtimestamp(int(timestamp))
-                                date_str = dt.strftime("%Y-%m-%d %H:%M")
-                            except:
-                                date_str = str(timestamp)
-                        
-                        # Get owner name
-                        owner_name = get_owner_name(owner_id)
-                        
-                        formatted_note = f"[{date_str}] ({owner_name}) {clean_body}"
-                        all_formatted_notes.append(formatted_note)
+            all_formatted_notes.extend(_format_contact_notes(get_notes_content(note_ids), get_owner_name))
     
     if all_formatted_notes:
         return "\n\n".join(all_formatted_notes)
@@ -609,6 +645,63 @@ def get_consolidated_notes_for_deal(deal_id):
         return "No notes"
 
 
+# ---- get_consolidated_notes_for_deals ----
+
+def _hs_associations_batch(from_type: str, to_type: str, ids: list[str]) -> dict[str, list[str]]:
+    """
+    v4 batch association read, 100 ids per request: id -> associated ids (in HubSpot order).
+    Soft-fails like the per-object helpers: a failed chunk just leaves its ids without associations.
+    """
+    out = {str(i): [] for i in ids}
+    url = f"{HS_ROOT}/crm/v4/associations/{from_type}/{to_type}/batch/read"
+    for i in range(0, len(ids), 100):
+        chunk = ids[i:i+100]
+        try:
+            r = requests.post(url, headers=hs_headers(), json={"inputs": [{"id": str(x)} for x in chunk]}, timeout=25)
+            if r.status_code not in (200, 207):
+                continue
+            for item in r.json().get("results", []):
+                src = str((item.get("from") or {}).get("id"))
+                out[src] = [str(t.get("toObjectId")) for t in item.get("to", []) if t.get("toObjectId")]
+        except Exception:
+            continue
+    return out
+
+def get_consolidated_notes_for_deals(deal_ids: list[str]) -> dict[str, str]:
+    """
+    get_consolidated_notes_for_deal for many deals with batched HubSpot calls: deal->contacts and
+    contact->notes association reads and note bodies go 100 ids per request instead of one or
+    more requests per deal/contact, shared contacts are read once, and each owner name is
+    looked up once. Deals without notes (or whose lookups failed) map to "No notes".
+    """
+    deal_ids = [str(d) for d in deal_ids]
+    d2c = _hs_associations_batch("deals", "contacts", deal_ids)
+    contact_ids = list(dict.fromkeys(c for cids in d2c.values() for c in cids))
+    c2n = _hs_associations_batch("contacts", "notes", contact_ids)
+    note_ids = list(dict.fromkeys(n for nids in c2n.values() for n in nids))
+    
+    notes_by_id = {}
+    for i in range(0, len(note_ids), 100):
+        for note in get_notes_content(note_ids[i:i+100]):
+            notes_by_id[str(note.get("id"))] = note
+    
+    owner_names = {}
+    def owner_name(owner_id):
+        if owner_id not in owner_names:
+            owner_names[owner_id] = get_owner_name(owner_id)
+        return owner_names[owner_id]
+    
+    contact_lines = {
+        cid: _format_contact_notes([notes_by_id[n] for n in c2n.get(cid, []) if n in notes_by_id], owner_name)
+        for cid in contact_ids
+    }
+    out = {}
+    for did in deal_ids:
+        lines = [line for cid in d2c.get(did, []) for line in contact_lines.get(cid, [])]
+        out[did] = "\n\n".join(lines) if lines else "No notes"
+    return out
+
+
 
 # ---- get_deals_by_owner_and_daterange ----
 
@@ -741,6 +834,36 @@ def hs_batch_read_deals(deal_ids: list[str], props: list[str]) -> dict[str, dict
             st.warning(f"Could not batch read deals (props={props}): {e}")
     return out
 
+
+# ---- hs_active_purchase_excluded_deal_ids ----
+
+def hs_active_purchase_excluded_deal_ids(deal_ids: list[str]) -> set[str]:
+    """
+    Deal ids (from deal_ids) whose contact also has another deal sitting in an
+    active purchase stage. Resolves deal -> contacts -> other deals -> stages
+    once; callers drop the returned ids with a single isin pass.
+    """
+    deal_ids = [str(d) for d in deal_ids]
+    if not deal_ids: return set()
+    d2c = hs_deals_to_contacts_map(deal_ids)
+    contact_ids = sorted({cid for cids in d2c.values() for cid in cids})
+    c2d = hs_contacts_to_deals_map(contact_ids)
+    deal_id_set = set(deal_ids)
+    other_deal_ids = sorted({did for dlist in c2d.values() for did in dlist if did not in deal_id_set})
+    stage_map = hs_batch_read_deals(other_deal_ids, props=["dealstage"])
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Checking %d deals: %s", len(deal_ids), deal_ids)
+        logger.debug("Deal-to-contact mapping: %s", d2c)
+        logger.debug("Contact-to-deals mapping: %s", c2d)
+        logger.debug("Retrieved stages for %d of %d other deals", len(stage_map), len(other_deal_ids))
+
+    # Other deals sitting in an active purchase stage, then every contact that has one.
+    active_other = {did for did, rec in stage_map.items()
+                    if did not in deal_id_set and (rec or {}).get("dealstage") in ACTIVE_PURCHASE_STAGE_IDS}
+    exclude_contacts = {cid for cid, dlist in c2d.items() if any(did in active_other for did in dlist)}
+    logger.debug("Contacts to exclude: %s", exclude_contacts)
+    return {d_id for d_id, cids in d2c.items() if any(c in exclude_contacts for c in cids)}
+
 # ============ Aircall ============
 
 
@@ -779,6 +902,7 @@ def filter_deals_by_appointment_id_car_active_purchases(deals_df: pd.DataFrame)
     
     # Get all deals for each appointment_id and check their stages
     deals_to_exclude = set()
+    deal_id_set = set(deal_ids)
     
     for appointment_id in appointment_ids:
         # Get all deals with this appointment_id
@@ -791,12 +915,13 @@ def filter_deals_by_appointment_id_car_active_purchases(deals_df: pd.DataFrame)
             # Check if any deal (other than our original ones) has active purchase stage
             has_active_purchase = False
             for check_deal_id in all_deals_for_appointment:
-                if check_deal_id in deal_ids:
+                if check_deal_id in deal_id_set:
                     continue  # Skip our original deals
                 
                 stage = (stage_data.get(check_deal_id, {}) or {}).get("dealstage")
                 
-                if stage and str(stage) in ACTIVE_PURCHASE_STAGE_IDS:
+                # HubSpot returns stage ids as strings; None/"" are simply not members.
+                if stage in ACTIVE_PURCHASE_STAGE_IDS:
                     has_active_purchase = True
                     break
             
@@ -806,15 +931,13 @@ def filter_deals_by_appointment_id_car_active_purchases(deals_df: pd.DataFrame)
                     if deal_appointment == appointment_id:
                         deals_to_exclude.add(deal_id)
     
-    # Filter the dataframe
-    work = deals_df.copy()
-    work["__keep"] = work["hs_object_id"].apply(lambda x: str(x) not in deals_to_exclude)
-    
-    dropped = work[~work["__keep"]].drop(columns=["__keep"]).copy()
-    kept = work[work["__keep"]].drop(columns=["__keep"]).copy()
+    # Filter the dataframe: one mask, two .loc slices (no working copy / helper column)
+    drop = deals_df["hs_object_id"].astype(str).isin(deals_to_exclude)
+    dropped = deals_df.loc[drop]
+    kept = deals_df.loc[~drop]
     
     if not dropped.empty:
-        dropped["Reason"] = "Car (via appointment_id) has another deal in active purchase stage"
+        dropped = dropped.assign(Reason="Car (via appointment_id) has another deal in active purchase stage")
     
     return kept, dropped
 
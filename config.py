@@ -30,11 +30,11 @@ STAGE_ENQUIRY_ID   = "1119198251"
 STAGE_BOOKED_ID    = "1119198252"
 STAGE_CONDUCTED_ID = "1119198253"
 OLD_LEAD_START_STAGES = {STAGE_ENQUIRY_ID, STAGE_BOOKED_ID, STAGE_CONDUCTED_ID}
-ACTIVE_PURCHASE_STAGE_IDS = {
+ACTIVE_PURCHASE_STAGE_IDS = frozenset({
     "8082239", "8082240", "8082241", "8082242", "8082243", "8406593",
     "14816089", "14804235", "14804236", "14804237", "14804238",
     "14804239", "14804240"
-}
+})
 DEAL_PROPS = [
     "hs_object_id", "dealname", "pipeline", "dealstage",
     "full_name", "email", "mobile", "phone",
@@ -2,20 +2,35 @@
 from config import *
 import streamlit as st
 import pandas as pd
+import numpy as np
 from core.utils import *
 import os
 import re
 
-# --- OpenAI initialisation (safe and optional) ---
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None
+# --- OpenAI initialisation (safe and optional, deferred to first use) ---
+# The SDK pulls in httpx/pydantic and friends, so it is imported on the first
+# draft rather than at module load; views that never draft skip the cost.
+OpenAI = None
+openai = None
+_openai_imported = False
 
-try:
-    import openai
-except Exception:
-    openai = None  # SDK not installed
+
+def _import_openai():
+    """Import the OpenAI SDK once; leaves OpenAI/openai as None if it is not installed."""
+    global OpenAI, openai, _openai_imported
+    if _openai_imported:
+        return
+    _openai_imported = True
+    try:
+        from openai import OpenAI as _OpenAI
+        OpenAI = _OpenAI
+    except Exception:
+        OpenAI = None
+    try:
+        import openai as _openai_module
+        openai = _openai_module
+    except Exception:
+        openai = None  # SDK not installed
 
 
 # Global flag used across the app to decide whether to call OpenAI or skip
@@ -36,6 +51,8 @@ def _init_openai():
         _openai_ok, _openai_mode = False, "none"
         return
 
+    _import_openai()
+
     # Prefer new client if available
     if OpenAI is not None:
         try:
@@ -57,8 +74,7 @@ def _init_openai():
 
     _openai_ok, _openai_mode = False, "none"
 
-# Do the one-time init on import
-_init_openai()
+# No init on import: _call_openai() initialises on the first draft.
 
 
 # ---- _call_openai ----
@@ -321,18 +337,20 @@ def draft_sms_oldlead_by_stage(name: str, car_text: str, stage_hint: str) -> str
 
 # ---- draft_sms_oldlead_by_stage_improved ----
 
-def draft_sms_oldlead_by_stage_improved(name: str, vehicle_details: list, stage_hint: str) -> str:
+def draft_sms_oldlead_by_stage_improved(name: str, vehicle_details: dict, stage_hint: str) -> str:
     """Generate improved SMS for old leads with vehicle details and stage-specific messaging using ChatGPT"""
     first = (name or "").split()[0] if (name or "").strip() else "there"
     
-    # Use first vehicle for primary messaging
-    primary_vehicle = vehicle_details[0] if vehicle_details else {}
-    make = primary_vehicle.get('make', '')
-    model = primary_vehicle.get('model', '')
-    year = primary_vehicle.get('year', '')
-    color = primary_vehicle.get('color', '')
-    url = primary_vehicle.get('url', '')
-    stage_id = primary_vehicle.get('stage_id', '')
+    # Use first vehicle for primary messaging (VehicleDetails holds one list per field)
+    def _primary(field: str) -> str:
+        vals = (vehicle_details or {}).get(field) or []
+        return vals[0] if vals else ''
+    make = _primary('make')
+    model = _primary('model')
+    year = _primary('year')
+    color = _primary('color')
+    url = _primary('url')
+    stage_id = _primary('stage_id')
     
     # Build vehicle description for ChatGPT
     vehicle_parts = []
@@ -410,26 +428,20 @@ def build_messages_with_audit(dedup_df: pd.DataFrame, mode: str) -> tuple[pd.Dat
     Build messages; also return a 'skipped' DF with reasons (e.g., missing phone, empty draft).
     """
     msgs_df = build_messages_from_dedup(dedup_df, mode=mode)
-    skipped = []
-    if dedup_df is not None and not dedup_df.empty:
-        for _, row in dedup_df.iterrows():
-            phone = str(row.get("Phone") or "").strip()
-            if not phone:
-                skipped.append({
-                    "Customer": str(row.get("CustomerName") or ""),
-                    "Email": str(row.get("Email") or ""),
-                    "Cars": str(row.get("Cars") or ""),
-                    "Reason": "Missing/invalid phone"
-                })
-            else:
-                if msgs_df.empty or not (msgs_df["Phone"] == phone).any():
-                    skipped.append({
-                        "Customer": str(row.get("CustomerName") or ""),
-                        "Email": str(row.get("Email") or ""),
-                        "Cars": str(row.get("Cars") or ""),
-                        "Reason": "No message generated"
-                    })
-    skipped_df = pd.DataFrame(skipped, columns=["Customer","Email","Cars","Reason"])
+    cols = ["Customer","Email","Cars","Reason"]
+    if dedup_df is None or dedup_df.empty:
+        return msgs_df, pd.DataFrame(columns=cols)
+    phones = text_column(dedup_df, "Phone")
+    missing = phones.eq("").to_numpy()
+    # One hashed isin against the built phones instead of a msgs_df scan per row.
+    no_msg = ~missing & ~phones.isin(set(msgs_df["Phone"])).to_numpy()
+    skip = missing | no_msg
+    skipped_df = pd.DataFrame({
+        "Customer": text_column(dedup_df, "CustomerName", strip=False),
+        "Email": text_column(dedup_df, "Email", strip=False),
+        "Cars": text_column(dedup_df, "Cars", strip=False),
+        "Reason": np.where(missing, "Missing/invalid phone", "No message generated"),
+    }, columns=cols)[skip].reset_index(drop=True)
     return msgs_df, skipped_df
 
 
@@ -440,16 +452,15 @@ def build_messages_from_dedup(dedup_df: pd.DataFrame, mode: str) -> pd.DataFrame
     if dedup_df is None or dedup_df.empty:
         return pd.DataFrame(columns=["CustomerName","Phone","Email","Cars","WhenExact","WhenRel","DealStages","Message"])
     out = []
-    for _, row in dedup_df.iterrows():
-        phone = str(row.get("Phone") or "").strip()
+    pairs = build_pairs_text_batch(dedup_df["Cars"], dedup_df["WhenRel"]).tolist()
+    n = len(dedup_df)
+    vehicle_col = dedup_df["VehicleDetails"].tolist() if "VehicleDetails" in dedup_df.columns else [{}] * n  # NEW: Get vehicle details
+    rows = zip(text_column(dedup_df, "Phone"), text_column(dedup_df, "CustomerName"), text_column(dedup_df, "Cars"),
+               text_column(dedup_df, "WhenRel"), text_column(dedup_df, "VideoURLs"), vehicle_col,
+               text_column(dedup_df, "StageHint", strip=False, default="unknown"), text_column(dedup_df, "Email"),
+               text_column(dedup_df, "WhenExact", strip=False), text_column(dedup_df, "DealStages", strip=False), pairs)
+    for phone, name, cars, when_rel, video_urls, vehicle_details, stage_hint, email, when_exact, stages, pairs_text in rows:
         if not phone: continue
-        name  = str(row.get("CustomerName") or "").strip()
-        cars  = str(row.get("Cars") or "").strip()
-        when_rel = str(row.get("WhenRel") or "").strip()
-        video_urls = str(row.get("VideoURLs") or "").strip()
-        vehicle_details = row.get("VehicleDetails", [])  # NEW: Get vehicle details
-        
-        pairs_text = build_pairs_text(cars, when_rel)
         
         if mode == "reminder":
             msg = draft_sms_reminder(name, pairs_text, video_urls)
@@ -457,17 +468,15 @@ def build_messages_from_dedup(dedup_df: pd.DataFrame, mode: str) -> pd.DataFrame
             msg = draft_sms_manager(name, pairs_text)
         elif mode == "oldlead":
             # Use improved old lead messaging
-            stage_hint = str(row.get("StageHint") or "unknown")
             msg = draft_sms_oldlead_by_stage_improved(name, vehicle_details, stage_hint)
         else:
             # Fallback to original for other modes
             car_text = cars or "the car you were eyeing"
-            stage_hint = str(row.get("StageHint") or "unknown")
             msg = draft_sms_oldlead_by_stage(name, car_text, stage_hint)
             
-        out.append({"CustomerName": name, "Phone": phone, "Email": str(row.get("Email") or "").strip(),
-                    "Cars": cars, "WhenExact": str(row.get("WhenExact") or ""), "WhenRel": when_rel,
-                    "DealStages": str(row.get("DealStages") or ""), "Message": msg})
+        out.append({"CustomerName": name, "Phone": phone, "Email": email,
+                    "Cars": cars, "WhenExact": when_exact, "WhenRel": when_rel,
+                    "DealStages": stages, "Message": msg})
     return pd.DataFrame(out, columns=["CustomerName","Phone","Email","Cars","WhenExact","WhenRel","DealStages","Message"])
 
 
@@ -9,8 +9,9 @@ Those selected will be assigned to the deduped customer list round-robin.
 
 from __future__ import annotations
 from datetime import date
-from itertools import cycle
+from functools import lru_cache
 from typing import List, Dict
+import numpy as np
 import pandas as pd
 
 
@@ -32,12 +33,29 @@ def list_associate_names() -> List[str]:
 def list_associate_email() -> List[str]:
     return [a["email"] for a in ASSOCIATES]
 
+_ASSOCIATES_BY_NAME: Dict[str, Dict[str, str]] = {a["name"]: a for a in ASSOCIATES}
+_ASSOCIATE_POS: Dict[str, int] = {a["name"]: i for i, a in enumerate(ASSOCIATES)}
+
+
+@lru_cache(maxsize=64)
+def _get_associates_by_names_cached(names_key: frozenset) -> tuple:
+    # Keep ASSOCIATES order so round-robin rotation is stable for a given selection.
+    hits = sorted((n for n in names_key if n in _ASSOCIATES_BY_NAME), key=_ASSOCIATE_POS.__getitem__)
+    return tuple(
+        {"name": a["name"], "email": a["email"], "internal_id": a["internal_id"]}
+        for a in (_ASSOCIATES_BY_NAME[n] for n in hits)
+    )
+
 def get_associates_by_names(selected_names: List[str]) -> List[Dict[str, str]]:
-    names = set(n.strip() for n in (selected_names or []))
-    return [ {"name": a["name"], "email": a["email"], "internal_id": a["internal_id"]}
-             for a in ASSOCIATES if a["name"] in names ]
+    names = frozenset(n.strip() for n in (selected_names or []))
+    # Copy the dicts so callers can't mutate the cached entries.
+    return [dict(a) for a in _get_associates_by_names_cached(names)]
 
 def round_robin_assign(dedup_df: pd.DataFrame, associates: List[Dict[str, str]], *, seed_date: date|None=None) -> pd.DataFrame:
+    """
+    Assign associates to deduped rows round-robin, starting from a date-seeded offset.
+    Rows are sorted by Phone/CustomerName first so the assignment is deterministic.
+    """
     if dedup_df is None or dedup_df.empty:
         out = dedup_df.copy() if isinstance(dedup_df, pd.DataFrame) else pd.DataFrame()
         if isinstance(out, pd.DataFrame) and not out.empty:
@@ -45,26 +63,14 @@ def round_robin_assign(dedup_df: pd.DataFrame, associates: List[Dict[str, str]],
             out["SalesEmail"] = ""
         return out
     if not associates:
-        out = dedup_df.copy()
-        out["SalesAssociate"] = ""
-        out["SalesEmail"] = ""
-        return out
-
-    work = dedup_df.copy().sort_values(by=["Phone","CustomerName"], na_position="last", kind="stable").reset_index(drop=True)
-    roster = associates[:]
-    if seed_date:
-        n = len(roster)
-        offset = (seed_date.year * 10000 + seed_date.month * 100 + seed_date.day) % n
-        roster = roster[offset:] + roster[:offset]
-    rr = cycle(roster)
+        return dedup_df.assign(SalesAssociate="", SalesEmail="", SalesUserIds=pd.NA)
 
-    names, emails, ids = [], [], []
-    for _i, _r in work.iterrows():
-        a = next(rr)
-        names.append(a["name"])
-        emails.append(a["email"])
-        ids.append(a["internal_id"])
-    work["SalesAssociate"] = names
-    work["SalesEmail"] = emails
-    work["SalesUserIds"] = ids
+    work = dedup_df.sort_values(by=["Phone","CustomerName"], na_position="last", kind="stable").reset_index(drop=True)
+    n = len(associates)
+    offset = (seed_date.year * 10000 + seed_date.month * 100 + seed_date.day) % n if seed_date else 0
+    # Row i gets associate (i + offset) % n — same order as cycling a rotated roster.
+    idx = (np.arange(len(work)) + offset) % n
+    work["SalesAssociate"] = np.array([a["name"] for a in associates])[idx]
+    work["SalesEmail"] = np.array([a["email"] for a in associates])[idx]
+    work["SalesUserIds"] = np.array([a["internal_id"] for a in associates])[idx]
     return work
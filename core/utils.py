@@ -1,21 +1,33 @@
 """General utilities (dates, filters, dedupe) — logic preserved."""
 from config import *
+import json
+import re
+import threading
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, date, timedelta
+from functools import lru_cache
+from itertools import zip_longest
 from zoneinfo import ZoneInfo
 import streamlit as st
 
 
 # ---- mel_day_bounds_to_epoch_ms ----
 
-def mel_day_bounds_to_epoch_ms(d: date) -> tuple[int, int]:
-    start_local = datetime(d.year, d.month, d.day, 0, 0, 0, tzinfo=MEL_TZ)
-    end_local   = start_local + timedelta(days=1) - timedelta(milliseconds=1)
-    start_ms    = int(start_local.astimezone(UTC_TZ).timestamp() * 1000)
-    end_ms      = int(end_local.astimezone(UTC_TZ).timestamp() * 1000)
+@lru_cache(maxsize=4096)
+def _mel_day_bounds_cached(d: date) -> tuple[int, int]:
+    # timestamp() on an aware datetime is already UTC epoch; midnights are whole seconds,
+    # so integer maths gives the exact ms bounds (end = next local midnight - 1ms).
+    start_local = datetime(d.year, d.month, d.day, tzinfo=MEL_TZ)
+    start_ms    = int(start_local.timestamp()) * 1000
+    end_ms      = int((start_local + timedelta(days=1)).timestamp()) * 1000 - 1
     return start_ms, end_ms
 
+def mel_day_bounds_to_epoch_ms(d: date) -> tuple[int, int]:
+    return _mel_day_bounds_cached(d)
+
+@lru_cache(maxsize=1024)
 def stage_label(stage_id: str) -> str:
     sid = str(stage_id or "")
     return STAGE_LABELS.get(sid, sid or "")
@@ -23,10 +35,20 @@ def stage_label(stage_id: str) -> str:
 # ---- parse_epoch_or_iso_to_local_date ----
 
 def parse_epoch_or_iso_to_local_date(s) -> date | None:
+    # Booking slots repeat across deals: memoize the hashable str/int inputs.
+    if isinstance(s, (str, int)): return _parse_epoch_or_iso_to_local_date_cached(s)
+    return _parse_epoch_or_iso_to_local_date(s)
+
+@lru_cache(maxsize=16384)
+def _parse_epoch_or_iso_to_local_date_cached(s) -> date | None:
+    return _parse_epoch_or_iso_to_local_date(s)
+
+def _parse_epoch_or_iso_to_local_date(s) -> date | None:
     try:
         if s is None or (isinstance(s, float) and np.isnan(s)): return None
         if isinstance(s, (int, np.integer)) or (isinstance(s, str) and s.isdigit()):
-            dt = pd.to_datetime(int(s), unit="ms", utc=True).tz_convert(MEL_TZ)
+            # ms epoch: stdlib is far cheaper than a scalar pd.to_datetime
+            return datetime.fromtimestamp(int(s) / 1000, UTC_TZ).astimezone(MEL_TZ).date()
         else:
             dt = pd.to_datetime(s, utc=True)
             if dt.tzinfo is None: dt = dt.tz_localize("UTC")
@@ -36,6 +58,14 @@ def parse_epoch_or_iso_to_local_date(s) -> date | None:
         try: return pd.to_datetime(s).date()
         except Exception: return None
 
+_TIME_FMTS = ("%H:%M", "%I:%M %p", "%H:%M:%S")
+# Anything those formats can parse matches this; other strings skip the strptime attempts.
+_TIME_RE = re.compile(r"^\d{1,2}:\d{1,2}(?::\d{1,2})?(?:\s*[AaPp][Mm])?$")
+# Column-wise patterns, compiled once (pandas .str methods take the .pattern text).
+_EPOCH_MS_RE = re.compile(r"\d{10,13}")
+_DECIMAL_RE  = re.compile(r"\d*\.?\d*")
+_DIGIT_RE    = re.compile(r"\d")
+
 def parse_td_slot_time_prop(val) -> str:
     """Parse HubSpot 'td_booking_slot_time' -> 'HH:MM' local if epoch, or normalize common strings."""
     if val is None or (isinstance(val, float) and np.isnan(val)): return ""
@@ -46,14 +76,15 @@ def parse_td_slot_time_prop(val) -> str:
             return pd.to_datetime(int(s), unit="ms", utc=True).tz_convert(MEL_TZ).strftime("%H:%M")
         except Exception:
             pass
-    for fmt in ["%H:%M", "%I:%M %p", "%H:%M:%S"]:
-        try:
-            t = datetime.strptime(s, fmt).time()
-            return f"{t.hour:02d}:{t.minute:02d}"
-        except Exception:
-            continue
+    if _TIME_RE.match(s):
+        for fmt in _TIME_FMTS:
+            try:
+                t = datetime.strptime(s, fmt).time()
+                return f"{t.hour:02d}:{t.minute:02d}"
+            except ValueError:
+                continue
     try:
-        ts = pd.to_datetime(s)
+        ts = pd.to_datetime(s, errors="coerce")
         if isinstance(ts, pd.Timestamp):
             if ts.tzinfo is None: ts = ts.tz_localize("UTC")
             ts = ts.tz_convert(MEL_TZ)
@@ -62,19 +93,161 @@ def parse_td_slot_time_prop(val) -> str:
         pass
     return s
 
+def parse_td_slot_time_prop_series(s: pd.Series) -> pd.Series:
+    """Column-wise parse_td_slot_time_prop: ms epochs vectorised, other strings once per distinct value."""
+    out = pd.Series("", index=s.index, dtype=object)
+    txt = s[s.notna()].map(str).str.strip()
+    txt = txt[txt != ""]
+    is_epoch = txt.str.fullmatch(_EPOCH_MS_RE.pattern)  # longer digit runs take the scalar path
+    ep = pd.to_datetime(pd.to_numeric(txt[is_epoch], errors="coerce"), unit="ms", utc=True, errors="coerce")
+    ep = ep[ep.notna()]
+    out[ep.index] = ep.dt.tz_convert(MEL_TZ).dt.strftime("%H:%M")
+    rest = txt.drop(ep.index)
+    out[rest.index] = _map_unique(rest, parse_td_slot_time_prop)
+    return out
+
+# ---- vectorised epoch/ISO parsing (used by prepare_deals) ----
+
+def _epoch_or_iso_to_local_series(values: pd.Series, *, seconds_heuristic: bool = False) -> pd.Series:
+    """
+    Column-wise counterpart of the scalar parsers: epoch / ISO values -> tz-aware
+    Melbourne datetimes, NaT where unparseable.
+    - seconds_heuristic=False: digit strings are epoch ms (parse_epoch_or_iso_to_local_date)
+    - seconds_heuristic=True:  strip, allow one '.', < 1e12 means seconds (_coerce_to_utc_datetime)
+    """
+    vals = values.reset_index(drop=True)
+    txt = vals[vals.notna()].astype(str)
+    if seconds_heuristic:
+        txt = txt.str.strip()
+        is_num = txt.str.fullmatch(_DECIMAL_RE.pattern) & txt.str.contains(_DIGIT_RE.pattern, regex=True)
+    else:
+        is_num = txt.str.isdigit()
+    txt = txt[txt != ""]
+    is_num = is_num.reindex(txt.index)
+
+    parts = []
+    nums = pd.to_numeric(txt[is_num], errors="coerce").astype("float64")
+    nums = nums.where(nums < 9e15)  # far past any real epoch; keeps to_datetime from overflowing
+    if not nums.empty:
+        if seconds_heuristic:
+            nums = nums.where(nums < 1e12, nums / 1000.0)
+            parts.append(pd.to_datetime(nums, unit="s", utc=True, errors="coerce"))
+        else:
+            parts.append(pd.to_datetime(nums, unit="ms", utc=True, errors="coerce"))
+    rest = txt[~is_num]
+    if not rest.empty:
+        iso = pd.to_datetime(rest, utc=True, errors="coerce", format="ISO8601")
+        miss = iso.isna()
+        if miss.any():
+            # Anything not ISO-shaped goes through the per-element parser, as the scalar path did.
+            iso[miss] = pd.to_datetime(rest[miss], utc=True, errors="coerce", format="mixed")
+        parts.append(iso)
+
+    if parts:
+        out = pd.concat(parts).reindex(vals.index)
+    else:
+        out = pd.Series(pd.NaT, index=vals.index, dtype="datetime64[ns, UTC]")
+    out.index = values.index
+    return out.dt.tz_convert(MEL_TZ)
+
+def _local_dates(local: pd.Series) -> pd.Series:
+    """tz-aware datetimes -> object column of datetime.date (None where missing)."""
+    return local.dt.date.astype(object).where(local.notna(), None)
+
+@lru_cache(maxsize=8)
+def _minute_labels(fmt: str) -> np.ndarray:
+    """fmt rendered for each of the 1440 minutes of a day (index = hour*60 + minute)."""
+    return np.array([datetime(2000, 1, 1, m // 60, m % 60).strftime(fmt) for m in range(1440)], dtype=object)
+
+def _local_times(local: pd.Series, fmt: str = "%I:%M %p") -> pd.Series:
+    """tz-aware datetimes -> formatted time strings ("" where missing); fmt may only use hour/minute fields."""
+    ok = local.notna().to_numpy()
+    mins = (local.dt.hour * 60 + local.dt.minute).to_numpy(dtype="float64")
+    out = np.full(len(local), "", dtype=object)
+    out[ok] = _minute_labels(fmt)[mins[ok].astype(np.int64)]
+    return pd.Series(out, index=local.index, dtype=object)
+
+# Text columns dedupe_users reads; cleaned once here so a missing value is '' rather than 'nan'.
+_CLEAN_STR_COLS = ("full_name", "email", "vehicle_make", "vehicle_model", "vehicle_year",
+                   "vehicle_colour", "vehicle_url", "video_url__short_")
+
+def _clean_str(s: pd.Series) -> pd.Series:
+    return s.fillna('').astype(str).str.strip()
+
+def _arrow_str(s: pd.Series) -> pd.Series:
+    """Arrow-backed strings for the dedupe key columns; left as-is if pyarrow isn't available."""
+    try: return s.astype("string[pyarrow]")
+    except Exception: return s
+
+def _date_column(src: pd.Series) -> pd.Series:
+    """prepare_deals date column; all-missing sources (e.g. td_conducted_date on enquiries) skip parsing."""
+    if not src.notna().any(): return pd.Series([None] * len(src), index=src.index, dtype=object)
+    return _local_dates(_epoch_or_iso_to_local_series(src))
+
+def _date_time_columns(src: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    prepare_deals (date, time) pair for one source column from a single parse. The date rule
+    (digit strings are always ms) and the time rule (strip, allow '.', < 1e12 means seconds) only
+    disagree on padded, decimal or short numbers; just those rows get a second, date-rule parse.
+    """
+    if not src.notna().any():
+        return pd.Series([None] * len(src), index=src.index, dtype=object), pd.Series("", index=src.index, dtype=object)
+    local = _epoch_or_iso_to_local_series(src, seconds_heuristic=True)
+    dates, times = _local_dates(local), _local_times(local)
+    txt = src[src.notna()].astype(str)
+    stripped = txt.str.strip()
+    digit = txt.str.isdigit()
+    time_num = stripped.str.fullmatch(_DECIMAL_RE.pattern) & stripped.str.contains(_DIGIT_RE.pattern, regex=True)
+    ms = pd.to_numeric(txt.where(digit), errors="coerce") >= 1e12
+    same = txt.eq(stripped) & ((digit & ms) | (~digit & ~time_num))
+    redo = same.index[~same.to_numpy(dtype=bool)]
+    if len(redo):
+        dates[redo] = _local_dates(_epoch_or_iso_to_local_series(src[redo]))
+    return dates, times
+
 # ---- normalize_phone ----
 
+_NON_DIGIT_RE    = re.compile(r'\D')
+_PHONE_CANONICAL = re.compile(r'\+61\d{9}')
+
 def normalize_phone(raw) -> str:
     if pd.isna(raw) or raw is None: return ''
     s = str(raw).strip()
-    if s.startswith('+'): digits = '+' + ''.join(ch for ch in s if ch.isdigit())
-    else:                 digits = ''.join(ch for ch in s if ch.isdigit())
+    # Common case first: most HubSpot numbers already arrive as +61XXXXXXXXX.
+    if _PHONE_CANONICAL.fullmatch(s): return s
+    if s.startswith('+'): digits = '+' + _NON_DIGIT_RE.sub('', s)
+    else:                 digits = _NON_DIGIT_RE.sub('', s)
     if digits.startswith('+61') and len(digits) == 12: return digits
     if digits.startswith('61')  and len(digits) == 11: return '+' + digits
     if digits.startswith('0')   and len(digits) == 10 and digits[1] == '4': return '+61' + digits[1:]
     if digits.startswith('4')   and len(digits) == 9:  return '+61' + digits
     return ''
 
+def normalize_phone_series(s: pd.Series) -> pd.Series:
+    """Column-wise normalize_phone: same four AU mobile shapes, via str/regex kernels."""
+    raw = s.where(s.notna(), '').astype(str).str.strip()
+    out = raw.astype(object)
+    # Already-canonical numbers pass straight through; only the rest take the cleanup path.
+    rest = ~raw.str.fullmatch(_PHONE_CANONICAL.pattern)
+    if not rest.any():
+        return out
+    raw = raw[rest]
+    has_plus = raw.str.startswith('+')
+    d = raw.str.replace(_NON_DIGIT_RE, '', regex=True)
+    d = d.where(~has_plus, '+' + d)
+    n = d.str.len()
+    out[rest] = np.select(
+        [
+            d.str.startswith('+61') & n.eq(12),
+            d.str.startswith('61')  & n.eq(11),
+            d.str.startswith('04')  & n.eq(10),
+            d.str.startswith('4')   & n.eq(9),
+        ],
+        [d, '+' + d, '+61' + d.str[1:], '+61' + d],
+        default='',
+    )
+    return out
+
 
 
 # ---- format_date_au ----
@@ -86,9 +259,15 @@ def format_date_au(d: date) -> str:
 
 # ---- rel_date ----
 
-def rel_date(d: date) -> str:
+@lru_cache(maxsize=1)
+def _today_mel(minute: int) -> date:
+    """Melbourne's date, resolved at most once per wall-clock minute (the key)."""
+    return datetime.now(MEL_TZ).date()
+
+def rel_date(d: date, today: date | None = None) -> str:
+    """`today` lets row loops resolve Melbourne's date once instead of per call."""
     if not isinstance(d, date): return ''
-    today = datetime.now(MEL_TZ).date()
+    if today is None: today = _today_mel(int(time.time() // 60))
     diff = (d - today).days
     if diff == 0: return 'today'
     if diff == 1: return 'tomorrow'
@@ -101,65 +280,90 @@ def rel_date(d: date) -> str:
 
 
 
+def rel_date_series(dates: pd.Series, today: date | None = None) -> pd.Series:
+    """Column-wise rel_date: same buckets via day differences + np.select; '' for non-dates."""
+    if today is None: today = datetime.now(MEL_TZ).date()
+    is_date = dates.map(lambda x: isinstance(x, date))
+    dt = pd.to_datetime(dates.where(is_date, None), errors="coerce")
+    diff = (dt - pd.Timestamp(today)).dt.days
+    out = np.select(
+        [diff.eq(0), diff.eq(1), diff.eq(-1), diff.between(2, 7), diff.between(-7, -2),
+         diff.between(8, 14), diff.between(-14, -8)],
+        ["today", "tomorrow", "yesterday", "in a few days", "a few days ago", "next week", "last week"],
+        default=dt.dt.strftime("%b %d").fillna(""),
+    )
+    return pd.Series(out, index=dates.index, dtype=object).where(is_date, "")
+
+
 # ---- prepare_deals ----
 
 def prepare_deals(df: pd.DataFrame | None) -> pd.DataFrame:
     if df is None or not isinstance(df, pd.DataFrame): df = pd.DataFrame()
-    else: df = df.copy()
+    else: df = df.copy(deep=False)  # only whole columns are (re)assigned below
     for c in DEAL_PROPS:
         if c not in df.columns: df[c] = pd.Series(dtype="object")
-    df["slot_date"]      = df["td_booking_slot"].apply(parse_epoch_or_iso_to_local_date)
-    df["slot_time"]      = df["td_booking_slot"].apply(parse_epoch_or_iso_to_local_time)
-    df["slot_date_prop"] = df["td_booking_slot_date"].apply(parse_epoch_or_iso_to_local_date)
-    df["slot_time_param"]= df["td_booking_slot_time"].apply(parse_td_slot_time_prop)
-    df["conducted_date_local"] = df["td_conducted_date"].apply(parse_epoch_or_iso_to_local_date)
-    df["conducted_time_local"] = df["td_conducted_date"].apply(parse_epoch_or_iso_to_local_time)
+    df["slot_date"], df["slot_time"] = _date_time_columns(df["td_booking_slot"])
+    df["slot_date_prop"] = _date_column(df["td_booking_slot_date"])
+    df["slot_time_param"]= parse_td_slot_time_prop_series(df["td_booking_slot_time"])
+    df["conducted_date_local"], df["conducted_time_local"] = _date_time_columns(df["td_conducted_date"])
     df["phone_raw"]      = df["mobile"].where(df["mobile"].notna(), df["phone"])
-    df["phone_norm"]     = df["phone_raw"].apply(normalize_phone)
-    df["email"]          = df["email"].fillna('')
-    df["full_name"]      = df["full_name"].fillna('')
+    df["phone_norm"]     = normalize_phone_series(df["phone_raw"])
+    df["dealstage"]      = _clean_str(df["dealstage"]).astype("category")
+    for c in _CLEAN_STR_COLS:
+        df[c] = _arrow_str(_clean_str(df[c]))
+    df["phone_norm"]     = _arrow_str(df["phone_norm"])
+    df["phone_raw"]      = _arrow_str(df["phone_raw"])
+    df["td_reminder_sms_sent"] = _arrow_str(df["td_reminder_sms_sent"])
+    # Lower-cased email and its domain, shared by filter_internal_test_emails and the dedupe key.
+    df["email_l"]        = df["email"].str.lower()
+    df["email_domain"]   = df["email_l"].str.rsplit("@", n=1).str[-1]
     return df
 
 
 
 # ---- filter_internal_test_emails ----
 
+_INTERNAL_EMAIL_DOMAINS = frozenset({"cars24.com", "yopmail.com"})
+
 def filter_internal_test_emails(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
-    """Remove cars24.com / yopmail.com emails. Return (filtered_df, removed_df[with Reason])."""
+    """Remove cars24.com / yopmail.com emails. Return (filtered_df, removed_df[with Reason]) as new .loc frames."""
     if df is None or df.empty or "email" not in df.columns:
         return df.copy() if isinstance(df, pd.DataFrame) else pd.DataFrame(), pd.DataFrame()
-    work = df.copy()
-    dom = work["email"].astype(str).str.strip().str.lower().str.split("@").str[-1]
-    mask = ~dom.isin({"cars24.com", "yopmail.com"})
-    removed = work[~mask].copy()
+    if "email_domain" in df.columns:
+        dom = df["email_domain"]
+    else:
+        dom = df["email"].astype(str).str.strip().str.lower().str.rsplit("@", n=1).str[-1]
+    mask = ~dom.isin(_INTERNAL_EMAIL_DOMAINS)
+    removed = df.loc[~mask]
     if not removed.empty:
-        removed["Reason"] = "Internal/test email domain"
-    return work[mask].copy(), removed
+        removed = removed.assign(Reason="Internal/test email domain")
+    return df.loc[mask], removed
 
 
 
 # ---- filter_sms_already_sent ----
 
+_SMS_SENT_VALUES = frozenset({"yes", "true"})
+
 def filter_sms_already_sent(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Filter out deals where td_reminder_sms_sent is already 'true' or 'Yes'.
     Returns (kept_df, removed_df) where removed_df includes a Reason column.
+    Both are new frames sliced with .loc, so the input is not copied up front.
     """
     if df is None or df.empty or "td_reminder_sms_sent" not in df.columns:
         return df.copy() if isinstance(df, pd.DataFrame) else pd.DataFrame(), pd.DataFrame()
     
-    work = df.copy()
+    # Check if SMS was already sent - check for both "true" (value) and "Yes" (label).
+    # prepare_deals stores the column as Arrow strings, so astype is a no-op there; missing
+    # values stay <NA> through lower() and isin() treats them as not sent.
+    mask = df["td_reminder_sms_sent"].astype("string").str.lower().isin(_SMS_SENT_VALUES)
     
-    # Check if SMS was already sent - check for both "true" (value) and "Yes" (label)
-    work["sms_sent"] = work["td_reminder_sms_sent"].apply(
-        lambda x: str(x).lower() in ['yes', 'true'] if pd.notna(x) else False
-    )
-    
-    removed = work[work["sms_sent"]].drop(columns=["sms_sent"]).copy()
-    kept = work[~work["sms_sent"]].drop(columns=["sms_sent"]).copy()
+    removed = df.loc[mask]
+    kept = df.loc[~mask]
     
     if not removed.empty:
-        removed["Reason"] = "SMS reminder already sent (td_reminder_sms_sent = true)"
+        removed = removed.assign(Reason="SMS reminder already sent (td_reminder_sms_sent = true)")
     
     return kept, removed
 
@@ -177,15 +381,18 @@ def get_all_deal_ids_for_contacts(messages_df: pd.DataFrame, deals_df: pd.DataFr
     if messages_df is None or messages_df.empty or deals_df is None or deals_df.empty:
         return phone_to_deals
     
-    # Create a mapping of normalized phone to deal IDs
-    for _, msg_row in messages_df.iterrows():
-        phone = str(msg_row.get("Phone", "")).strip()
-        if not phone:
-            continue
-        
-        # Find all deals with this phone number
-        matching_deals = deals_df[deals_df["phone_norm"] == phone]["hs_object_id"].tolist()
-        phone_to_deals[phone] = [str(d) for d in matching_deals if d]
+    if "Phone" not in messages_df.columns:
+        return phone_to_deals
+    
+    # Build normalized phone -> deal IDs once (groups keep row order), then look up each message phone
+    ids = deals_df["hs_object_id"]
+    keep = ids.map(bool)
+    by_phone = ids[keep].astype(str).groupby(deals_df["phone_norm"][keep], sort=False).agg(list).to_dict()
+    
+    phones = messages_df["Phone"].map(str).str.strip()
+    for phone in phones.unique():
+        if phone:
+            phone_to_deals[phone] = list(by_phone.get(phone, ()))
     
     return phone_to_deals
 
@@ -198,121 +405,193 @@ def dedupe_users_with_audit(df: pd.DataFrame, *, use_conducted: bool) -> tuple[p
     Same as dedupe_users, but also returns a DataFrame of deals 'removed' by dedupe
     (i.e., additional deals beyond the first per user_key), with a Reason.
     """
-    base = dedupe_users(df, use_conducted=use_conducted)
     if df is None or df.empty:
+        return dedupe_users(df, use_conducted=use_conducted), pd.DataFrame()
+    work = _attach_user_key(df)
+    base = _dedupe_keyed(work, use_conducted=use_conducted)
+
+    # Everything after the first deal per user_key is what dedupe dropped.
+    dup = work.duplicated("user_key", keep="first")
+    if not dup.any():
         return base, pd.DataFrame()
-    work = df.copy()
-    work["email_l"] = work["email"].astype(str).str.strip().str.lower()
-    work["user_key"] = (work["phone_norm"].fillna('') + "|" + work["email_l"].fillna('')).str.strip()
-    work = work[work["user_key"].astype(bool)]
-    dropped_rows = []
-    for _, grp in work.groupby("user_key", sort=False):
-        if len(grp) <= 1:
-            continue
-        representative = grp.iloc[0]
-        rep_name  = str(representative.get("full_name") or "").strip()
-        rep_phone = str(representative.get("phone_norm") or "").strip()
-        rep_email = str(representative.get("email") or "").strip()
-        for _, r in grp.iloc[1:].iterrows():
-            dropped_rows.append({
-                "hs_object_id": r.get("hs_object_id"),
-                "full_name": r.get("full_name"),
-                "email": r.get("email"),
-                "phone_norm": r.get("phone_norm"),
-                "vehicle_make": r.get("vehicle_make"),
-                "vehicle_model": r.get("vehicle_model"),
-                "dealstage": r.get("dealstage"),
-                "Reason": f"Deduped under {rep_name or rep_phone or rep_email}"
-            })
-    dropped_df = pd.DataFrame(dropped_rows)
+    first = work.loc[~dup]
+    name, phone, email = (text_column(first, c) for c in ("full_name", "phone_norm", "email"))
+    rep = pd.Series(np.where(name != "", name, np.where(phone != "", phone, email)), index=first["user_key"])
+    cols = ["hs_object_id","full_name","email","phone_norm","vehicle_make","vehicle_model","dealstage"]
+    # Listed group by group (user_key is numbered in first-seen order), as the groupby loop used to.
+    dropped = work.loc[dup].sort_values("user_key", kind="stable")
+    dropped_df = dropped.reindex(columns=cols).reset_index(drop=True)
+    dropped_df["Reason"] = "Deduped under " + dropped["user_key"].map(rep).reset_index(drop=True)
     return base, dropped_df
 
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def _filter_and_dedupe_cached(deals: pd.DataFrame, use_conducted: bool, as_of: date):
+    # as_of only keys the cache: WhenRel ("today", "tomorrow", ...) must not outlive the day.
+    deals_f, removed_internal = filter_internal_test_emails(deals)
+    dedup, dedupe_dropped = dedupe_users_with_audit(deals_f, use_conducted=use_conducted)
+    return deals_f, removed_internal, dedup, dedupe_dropped
+
+def filter_and_dedupe(deals: pd.DataFrame, *, use_conducted: bool):
+    """
+    filter_internal_test_emails + dedupe_users_with_audit, memoized with st.cache_data on the
+    deal frame's contents, so fetching the same deals again skips the pandas work.
+    Returns (deals_f, removed_internal, dedup, dedupe_dropped).
+    """
+    return _filter_and_dedupe_cached(deals, use_conducted, datetime.now(MEL_TZ).date())
+
+
+
+# ---- column helpers for dedupe_users ----
+
+def _col_or(df: pd.DataFrame, col: str, default=None) -> pd.Series:
+    """Column-wise `row.get(col) or default` (default may be a scalar or an aligned Series)."""
+    if col not in df.columns:
+        return default if isinstance(default, pd.Series) else pd.Series(default, index=df.index, dtype=object)
+    s = df[col].astype(object)
+    return s.where(s.map(bool), default)
+
+def _stage_codes(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """dealstage as (category codes, str id per category); code -1 is missing and matches nothing."""
+    stage = df["dealstage"] if "dealstage" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    stage = stage.astype("category")
+    ids = np.array([str(c or "") for c in stage.cat.categories], dtype=object)
+    return stage.cat.codes.to_numpy(), ids
+
+def _first_candidates(s: pd.Series) -> pd.Series:
+    """Per-row form of first_nonempty_str's cleaning: usable string or None."""
+    c = s.astype(str).fillna("").str.strip()
+    return c.where(c.astype(bool) & (c.str.lower() != "nan"), None)
+
+def _group_runs(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Stable order that groups equal codes together, plus run boundaries [0, ..., n]."""
+    order = np.argsort(codes, kind="stable")
+    inner = np.flatnonzero(np.diff(codes[order])) + 1
+    return order, np.concatenate(([0], inner, [len(codes)]))
+
+def _map_unique(s: pd.Series, fn) -> pd.Series:
+    """Apply fn once per distinct value (low-cardinality columns like colours and stages)."""
+    return s.map({v: fn(v) for v in s.unique()})
+
+def text_column(df: pd.DataFrame, col: str, *, strip: bool = True, default: str = "") -> pd.Series:
+    """Column-wise `str(row.get(col) or default)`, stripped by default; a missing column is all default."""
+    s = _col_or(df, col, default).map(str)
+    return s.str.strip() if strip else s
+
 
 # ---- dedupe_users ----
 
+# Keys of each customer's VehicleDetails: a dict of per-field lists, one entry per deal (in deal order).
+_VEHICLE_DETAIL_FIELDS = ("make", "model", "year", "color", "url", "stage_id")
+
 def dedupe_users(df: pd.DataFrame, *, use_conducted: bool) -> pd.DataFrame:
     """Return rows with: CustomerName, Phone, Email, DealsCount, Cars, WhenExact, WhenRel, DealStages, StageHint, VehicleDetails."""
     if df is None or df.empty:
         return pd.DataFrame(columns=["CustomerName","Phone","Email","DealsCount","Cars","WhenExact","WhenRel","DealStages","StageHint","VehicleDetails"])
-    work = df.copy()
-    work["email_l"] = work["email"].astype(str).str.strip().str.lower()
-    work["user_key"] = (work["phone_norm"].fillna('') + "|" + work["email_l"].fillna('')).str.strip()
-    work = work[work["user_key"].astype(bool)]
-    rows = []
-    for _, grp in work.groupby("user_key", sort=False):
-        name  = first_nonempty_str(grp["full_name"])
-        phone = first_nonempty_str(grp["phone_norm"])
-        email = first_nonempty_str(grp["email"])
-        cars_list, when_exact_list, when_rel_list, stages_list, video_urls_list = [], [], [], [], []
-        vehicle_details_list = []  # NEW: Store detailed vehicle info
-        
-        for _, r in grp.iterrows():
-            # Build basic car description
-            car = f"{str(r.get('vehicle_make') or '').strip()} {str(r.get('vehicle_model') or '').strip()}".strip() or "car"
-            
-            # NEW: Build detailed vehicle info for messaging
-            vehicle_year = str(r.get('vehicle_year') or '').strip()
-            vehicle_colour = str(r.get('vehicle_colour') or '').strip()
-            vehicle_url = str(r.get('vehicle_url') or '').strip()
-            simplified_color = simplify_vehicle_color(vehicle_colour)
-            stage_id = str(r.get('dealstage') or '').strip()
-            
-            # Store detailed vehicle info as dict
-            vehicle_detail = {
-                'make': str(r.get('vehicle_make') or '').strip(),
-                'model': str(r.get('vehicle_model') or '').strip(), 
-                'year': vehicle_year,
-                'color': simplified_color,
-                'url': vehicle_url,
-                'stage_id': stage_id
-            }
-            vehicle_details_list.append(vehicle_detail)
-            
-            if use_conducted:
-                d = r.get("conducted_date_local"); t = r.get("conducted_time_local") or ""
-            else:
-                d = r.get("slot_date_prop") or r.get("slot_date")
-                t = r.get("slot_time_param") or r.get("slot_time") or ""
-            when_rel = rel_date(d) if isinstance(d, date) else ""
-            when_exact = (f"{format_date_au(d)} {t}".strip()).strip()
-
-            # Collect video URL
-            video_url = str(r.get("video_url__short_") or "").strip()
-
-            cars_list.append(car)
-            when_exact_list.append(when_exact)
-            when_rel_list.append(when_rel if t == "" else f"{when_rel} at {t}".strip())
-            stages_list.append(str(r.get("dealstage") or ""))
-            if video_url:  # Only add non-empty video URLs
-                video_urls_list.append(video_url)
-
-        stage_labels = sorted({stage_label(x) for x in stages_list if str(x)})
-        if STAGE_CONDUCTED_ID in stages_list: hint = "conducted"
-        elif STAGE_BOOKED_ID in stages_list: hint = "booked"
-        elif STAGE_ENQUIRY_ID in stages_list: hint = "enquiry"
-        else: hint = "unknown"
-
-        # Get unique video URLs
-        unique_video_urls = list(set([url for url in video_urls_list if url]))
-
-        rows.append({
-            "CustomerName": name, "Phone": phone, "Email": email,
-            "DealsCount": len([c for c in cars_list if c]),
-            "Cars": "; ".join([c for c in cars_list if c]),
-            "WhenExact": "; ".join([w for w in when_exact_list if w]),
-            "WhenRel": "; ".join([w for w in when_rel_list if w]),
-            "DealStages": "; ".join(stage_labels) if stage_labels else "",
-            "StageHint": hint,
-            "VideoURLs": "; ".join(unique_video_urls) if unique_video_urls else "",
-            "VehicleDetails": vehicle_details_list  # NEW: Detailed vehicle info
-        })
-    out = pd.DataFrame(rows)
+    return _dedupe_keyed(_attach_user_key(df), use_conducted=use_conducted)
+
+def _attach_user_key(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of df with email_l and an integer user_key: one id per distinct (phone_norm, email_l)
+    pair, numbered in first-seen order. Factorizing the two columns and combining their codes
+    groups exactly like the old "phone|email" string key without building a string per row.
+    """
+    work = df.copy(deep=False)  # new columns only; the caller's frame is untouched
+    if "email_l" not in work.columns:  # prepare_deals already provides it
+        work["email_l"] = work["email"].astype(str).str.strip().str.lower()
+    phone_codes, _ = pd.factorize(work["phone_norm"].fillna(''))
+    email_codes, email_uniques = pd.factorize(work["email_l"].fillna(''))
+    pair = phone_codes.astype(np.int64) * (len(email_uniques) + 1) + email_codes
+    work["user_key"] = pd.factorize(pair)[0]
+    return work
+
+def _dedupe_keyed(work: pd.DataFrame, *, use_conducted: bool) -> pd.DataFrame:
+    """dedupe_users body for a frame that already went through _attach_user_key."""
+    if work.empty:
+        return pd.DataFrame()
+    work = work.copy(deep=False)
+
+    # Per-row strings first (same `x or ''` truthiness as before), then one groupby-agg.
+    # The *_nz columns hold first_nonempty_str's cleaned value or None, so groupby 'first' picks it.
+    work["_name_nz"] = _first_candidates(work["full_name"])
+    work["_phone_nz"] = _first_candidates(work["phone_norm"])
+    work["_email_nz"] = _first_candidates(work["email"])
+    make, model = text_column(work, "vehicle_make"), text_column(work, "vehicle_model")
+    work["_car"] = (make + " " + model).str.strip().replace("", "car")
+    work["_stage"] = text_column(work, "dealstage", strip=False)
+    work["_stage_label"] = _map_unique(work["_stage"], stage_label)
+    work["_video"] = text_column(work, "video_url__short_")
+    # VehicleDetails fields stay as plain columns (one per field) instead of a dict per deal.
+    work["_vd_make"] = make
+    work["_vd_model"] = model
+    work["_vd_year"] = text_column(work, "vehicle_year")
+    work["_vd_color"] = simplify_vehicle_color_series(text_column(work, "vehicle_colour"))
+    work["_vd_url"] = text_column(work, "vehicle_url")
+    work["_vd_stage_id"] = text_column(work, "dealstage")
+
+    if use_conducted:
+        d = _col_or(work, "conducted_date_local")
+        t = _col_or(work, "conducted_time_local", "")
+    else:
+        d = _col_or(work, "slot_date_prop", _col_or(work, "slot_date"))
+        t = _col_or(work, "slot_time_param", _col_or(work, "slot_time", ""))
+    t = t.map(str)
+    today = datetime.now(MEL_TZ).date()
+    when_rel = rel_date_series(d, today)
+    work["_when_exact"] = (d.map(format_date_au) + " " + t).str.strip()
+    work["_when_rel"] = when_rel.where(t.eq(""), (when_rel + " at " + t).str.strip())
+    stage_codes, stage_ids = _stage_codes(work)
+    work["_is_conducted"] = np.isin(stage_codes, np.flatnonzero(stage_ids == STAGE_CONDUCTED_ID))
+    work["_is_booked"] = np.isin(stage_codes, np.flatnonzero(stage_ids == STAGE_BOOKED_ID))
+    work["_is_enquiry"] = np.isin(stage_codes, np.flatnonzero(stage_ids == STAGE_ENQUIRY_ID))
+
+    # Cheap cython aggregations through groupby; user_key is numbered in first-seen order, so
+    # sorting by it keeps groupby(sort=False)'s row order.
+    out = work.groupby("user_key", sort=True).agg(
+        CustomerName=("_name_nz", "first"),
+        Phone=("_phone_nz", "first"),
+        Email=("_email_nz", "first"),
+        DealsCount=("_car", "size"),
+        IsConducted=("_is_conducted", "any"),
+        IsBooked=("_is_booked", "any"),
+        IsEnquiry=("_is_enquiry", "any"),
+    ).reset_index(drop=True)
+
+    # String/list columns: one stable argsort on the key, then slice each run of equal keys
+    # (no per-group Series objects).
+    order, bounds = _group_runs(work["user_key"].to_numpy())
+    runs = list(zip(bounds[:-1], bounds[1:]))
+    def _runs(col: str) -> np.ndarray:
+        return work[col].to_numpy(dtype=object)[order]
+    cars, when_exact, when_rel = _runs("_car"), _runs("_when_exact"), _runs("_when_rel")
+    labels, videos = _runs("_stage_label"), _runs("_video")
+    details = {k: _runs("_vd_" + k) for k in _VEHICLE_DETAIL_FIELDS}
+    out["Cars"] = ["; ".join(x for x in cars[i:j] if x) for i, j in runs]
+    out["WhenExact"] = ["; ".join(x for x in when_exact[i:j] if x) for i, j in runs]
+    out["WhenRel"] = ["; ".join(x for x in when_rel[i:j] if x) for i, j in runs]
+    out["DealStages"] = ["; ".join(sorted({x for x in labels[i:j] if x})) for i, j in runs]
+    out["VideoURLs"] = ["; ".join(dict.fromkeys(x for x in videos[i:j] if x)) for i, j in runs]
+    out["VehicleDetails"] = [{k: v[i:j].tolist() for k, v in details.items()} for i, j in runs]
+    out[["CustomerName","Phone","Email"]] = out[["CustomerName","Phone","Email"]].fillna("")
+    out["StageHint"] = np.select(
+        [out["IsConducted"], out["IsBooked"], out["IsEnquiry"]],
+        ["conducted", "booked", "enquiry"],
+        default="unknown",
+    )
     want = ["CustomerName","Phone","Email","DealsCount","Cars","WhenExact","WhenRel","DealStages","StageHint","VideoURLs","VehicleDetails"]
-    return out[want] if not out.empty else out
+    return out[want]
 
 
 def _coerce_to_utc_datetime(value):
+    """Memoized for hashable str/int inputs; see _coerce_to_utc_datetime_uncached."""
+    if isinstance(value, (str, int)): return _coerce_to_utc_datetime_cached(value)
+    return _coerce_to_utc_datetime_uncached(value)
+
+@lru_cache(maxsize=16384)
+def _coerce_to_utc_datetime_cached(value):
+    return _coerce_to_utc_datetime_uncached(value)
+
+def _coerce_to_utc_datetime_uncached(value):
     """
     Best-effort parser that accepts:
       - epoch milliseconds (13 digits) or seconds (10 digits)
@@ -438,7 +717,7 @@ def _search_once(payload: dict, total_cap: int) -> pd.DataFrame:
     - If HubSpot returns a non-200 status, we try to show a meaningful error payload in Streamlit
       (parsed JSON if possible, else raw text), then stop the loop gracefully.
     - If any exception occurs (network, JSON parsing, etc.), we display a Streamlit error and stop.
-    - We use a small `time.sleep(0.08)` between pages as a courtesy throttle to avoid hammering the API.
+    - Consecutive page requests are spaced at least 0.08s apart as a courtesy throttle to avoid hammering the API.
 
     Notes on pagination and limits
     ------------------------------
@@ -460,6 +739,7 @@ def _search_once(payload: dict, total_cap: int) -> pd.DataFrame:
                 payload["after"] = after
 
             # POST the search request. The payload is expected to contain filterGroups, properties, etc.
+            sent_at = time.monotonic()
             r = requests.post(HS_SEARCH_URL, headers=hs_headers(), json=payload, timeout=25)
 
             # Original logic: do not raise; instead, branch on status_code so we can show a nicer message.
@@ -494,7 +774,8 @@ def _search_once(payload: dict, total_cap: int) -> pd.DataFrame:
                 break
 
             # Courtesy throttle to avoid rate limits / spikes when fetching many pages.
-            time.sleep(0.08)
+            # Counted from when this page was requested, so time spent on the response counts towards it.
+            time.sleep(max(0.0, 0.08 - (time.monotonic() - sent_at)))
 
         except Exception as e:
             # Any network, parsing, or unexpected error: report and abort the loop.
@@ -505,6 +786,22 @@ def _search_once(payload: dict, total_cap: int) -> pd.DataFrame:
     # Otherwise, return an empty DataFrame with the expected columns so downstream code does not crash.
     return pd.DataFrame(results) if results else pd.DataFrame(columns=DEAL_PROPS)
 
+# ---- RatePacer ----
+
+class RatePacer:
+    """Hands out start slots at least 1/per_sec apart across worker threads."""
+    def __init__(self, per_sec: float):
+        self._gap = 1.0 / per_sec
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self._gap
+        time.sleep(slot - now)
+
 def analyze_with_chatgpt(notes_text, customer_name="Customer", vehicle="Vehicle"):
     """Analyze customer notes using ChatGPT with enhanced debugging"""
     if not notes_text or notes_text == "No notes":
@@ -685,6 +982,52 @@ def build_pairs_text(cars: str, when_rel: str) -> str:
     return "; ".join([p for p in pairs if p])
 
 
+def _split_semicolon_items(v) -> list[str]:
+    return [x.strip() for x in str(v or "").split(";") if x.strip()]
+
+
+def build_pairs_text_batch(cars: pd.Series, when_rel: pd.Series) -> pd.Series:
+    """
+    Column-wise build_pairs_text over aligned Cars / WhenRel series (same index).
+    Same cleaning and pairing rules; returns an object Series of pair strings.
+    """
+    out = [
+        "; ".join(p for p in (f"{c} {w}".strip() for c, w in
+                              zip_longest(_split_semicolon_items(a), _split_semicolon_items(b), fillvalue="")) if p)
+        for a, b in zip(cars, when_rel)
+    ]
+    return pd.Series(out, index=cars.index, dtype=object)
+
+
+_SUMMARY_HINTS = ("summary", "what happened", "customer")
+
+def _first_hint_line(text: str) -> str:
+    """
+    First line (stripped) that contains a _SUMMARY_HINTS word, case-insensitively, and is
+    longer than 10 chars; "" if none. Searches the lower-cased blob with str.find and only
+    slices out the lines that actually contain a hint, instead of splitting every line.
+    """
+    low = text.lower()
+    if len(low) != len(text):  # lower() changed some lengths, so offsets would not line up
+        for line in text.split("\n"):
+            if any(w in line.lower() for w in _SUMMARY_HINTS) and len(line.strip()) > 10:
+                return line.strip()
+        return ""
+    pos = 0
+    while True:
+        hits = [i for i in (low.find(w, pos) for w in _SUMMARY_HINTS) if i != -1]
+        if not hits:
+            return ""
+        i = min(hits)
+        start = text.rfind("\n", 0, i) + 1
+        end = text.find("\n", i)
+        if end == -1:
+            end = len(text)
+        line = text[start:end].strip()
+        if len(line) > 10:
+            return line
+        pos = end + 1
+
 def create_fallback_analysis(raw_response, customer_name):
     """
     Build a *safe, structured* analysis dictionary when parsing an LLM/JSON
@@ -703,8 +1046,7 @@ def create_fallback_analysis(raw_response, customer_name):
        - category  → "No clear reason documented"
        - next_steps→ "Review notes manually and contact customer"
     2) Make a *best-effort* attempt to extract a short summary line from the raw text:
-       - Split text by lines
-       - Scan for the first line containing any of the hints:
+       - Find the first line (via str.find on the whole text) containing any of the hints:
          "summary", "what happened", "customer" (case-insensitive)
        - If that line has >10 chars, use its first 100 chars as the summary
     3) Always include a trimmed copy of the original text (first 200 chars) in
@@ -736,9 +1078,6 @@ def create_fallback_analysis(raw_response, customer_name):
            "raw_response": "SUMMARY: Missed call; Customer said they will call back"
          }
     """
-    # Break the raw text into lines so we can scan them for a plausible summary.
-    lines = raw_response.split("\n")
-
     # Conservative defaults (used if we cannot extract anything meaningful).
     summary = "Analysis incomplete due to formatting issues"
     category = "No clear reason documented"
@@ -748,12 +1087,9 @@ def create_fallback_analysis(raw_response, customer_name):
     # Look for the first line that *looks like* a summary cue. We use a small set
     # of keywords and keep it case-insensitive. If a matching line is long enough,
     # we take up to 100 characters as the summary.
-    for line in lines:
-        lower = line.lower()
-        if any(word in lower for word in ["summary", "what happened", "customer"]):
-            if len(line.strip()) > 10:
-                summary = line.strip()[:100]  # keep summaries short for UI readability
-                break
+    line = _first_hint_line(raw_response)
+    if line:
+        summary = line[:100]  # keep summaries short for UI readability
 
     # Always return a compact copy of the raw response for human review.
     # Trim at 200 characters to avoid dumping large payloads into the UI.
@@ -776,17 +1112,19 @@ def first_nonempty_str(series: pd.Series) -> str:
     (e.g., firstname, fullname, nickname). This helper picks the first one that
     actually contains a usable value after cleaning.
 
-    BEHAVIOUR (unchanged)
-    ---------------------
+    BEHAVIOUR
+    ---------
     1) If the input is None → return "".
-    2) Convert every value to a string (so numbers/None/NaN become strings), then:
-       - fill NaN with "" to avoid "nan" strings from pandas
-       - strip surrounding whitespace
-    3) Filter out:
+    2) Walk the values in order, stopping at the first hit:
+       - skip missing values (None/NaN/NA); these used to be stringified first, so a
+         None ahead of a real value came back as the literal "None"
+       - convert everything else to a string (so numbers become strings) and strip
+         surrounding whitespace
+    3) Skip:
        - empty strings ("")
-       - the literal string "nan" (case-insensitive), which can still appear when the
-         original value stringified to "nan".
-    4) If any values remain, return the *first*; else return "".
+       - the literal string "nan" (case-insensitive), e.g. a "nan" that was already
+         stringified upstream.
+    4) Return the first value that survives; else return "".
 
     PARAMETERS
     ----------
@@ -808,18 +1146,20 @@ def first_nonempty_str(series: pd.Series) -> str:
     if series is None:
         return ""
 
-    # 1) Coerce *all* values to strings so downstream string ops are safe.
-    # 2) Turn real NaNs into "" so they do not become the literal "nan" later.
-    # 3) Trim surrounding whitespace from each string.
-    s = series.astype(str).fillna("").map(lambda x: x.strip())
-
-    # Keep only strings that are:
-    #   - truthy after stripping (not empty),
-    #   - not the literal "nan" (case-insensitive) which can arise from prior conversions.
-    s = s[(s.astype(bool)) & (s.str.lower() != "nan")]
+    # One pass that stops at the first hit (no whole-Series astype/fillna/strip copies):
+    #   - missing values (None/NaN/NA) are skipped rather than stringified,
+    #   - everything else is stringified and trimmed,
+    #   - empty strings and the literal "nan" (case-insensitive) are skipped.
+    for v in series:
+        if v is None or (not isinstance(v, str) and pd.api.types.is_scalar(v) and pd.isna(v)):
+            continue
+        s = str(v).strip()
+        if s and s.lower() != "nan":
+            return s
+    return ""
 
-    # Return the first surviving value, or "" if we filtered everything out.
-    return s.iloc[0] if not s.empty else ""
+# Raw control characters an LLM may leave inside JSON strings -> their escape sequences (one pass).
+_JSON_CONTROL_ESCAPES = str.maketrans({"\n": "\\n", "\t": "\\t", "\r": "\\r"})
 
 def fix_json_response(response_text):
     """
@@ -858,6 +1198,10 @@ def fix_json_response(response_text):
         A JSON-parseable string if salvage succeeded, else None.
     """
     try:
+        # 0) Prose-only replies have no object to salvage.
+        if '{' not in response_text:
+            return None
+
         # 1) Remove any text before the FIRST '{'
         #    Rationale: LLMs often prefix with explanations (e.g., "Here is your JSON:")
         start_idx = response_text.find('{')
@@ -872,7 +1216,7 @@ def fix_json_response(response_text):
 
         # 3) Escape common control characters that break JSON parsing when unescaped.
         #    This does NOT alter content; it just makes the string JSON-valid.
-        response_text = response_text.replace('\n', '\\n').replace('\t', '\\t')
+        response_text = response_text.translate(_JSON_CONTROL_ESCAPES)
 
         # 4) Validate: only return the string if json.loads() accepts it.
         json.loads(response_text)
@@ -889,6 +1233,28 @@ def mel_range_bounds_to_epoch_ms(d1: date, d2: date) -> tuple[int, int]:
     _,e = mel_day_bounds_to_epoch_ms(d2)
     return s,e
 
+# Checked in this order; the first group with a word occurring anywhere in the colour wins.
+_COLOR_GROUPS = (
+    ("Red",    ('red', 'crimson', 'scarlet', 'burgundy', 'ruby', 'cherry', 'rose')),
+    ("Blue",   ('blue', 'navy', 'azure', 'cobalt', 'sapphire', 'indigo', 'teal')),
+    ("White",  ('white', 'pearl', 'ivory', 'cream', 'snow', 'frost')),
+    ("Black",  ('black', 'ebony', 'coal', 'charcoal', 'onyx', 'midnight')),
+    ("Silver", ('silver', 'grey', 'gray', 'platinum', 'steel', 'graphite', 'titanium')),
+    ("Green",  ('green', 'emerald', 'forest', 'sage', 'olive', 'lime')),
+    ("Gold",   ('yellow', 'gold', 'amber', 'champagne', 'bronze')),
+    ("Orange", ('orange', 'copper', 'sunset', 'rust')),
+    ("Purple", ('purple', 'violet', 'magenta', 'plum')),
+    ("Brown",  ('brown', 'tan', 'beige', 'mocha', 'coffee', 'chocolate')),
+)
+_COLOR_PATTERNS = tuple((label, re.compile("|".join(words))) for label, words in _COLOR_GROUPS)
+# Bare keywords ("red", "pearl", ...) resolved up front by the same ordered scan.
+_COLOR_WORDS = {
+    w: next(label for label, rx in _COLOR_PATTERNS if rx.search(w))
+    for _, words in _COLOR_GROUPS for w in words
+}
+_COLOR_RANK = {label: i for i, (label, _) in enumerate(_COLOR_GROUPS)}
+
+@lru_cache(maxsize=1024)
 def simplify_vehicle_color(color_name: str) -> str:
     """Simplify complex manufacturer color names to basic colors for SMS messages"""
     if not color_name or pd.isna(color_name):
@@ -896,41 +1262,26 @@ def simplify_vehicle_color(color_name: str) -> str:
     
     color = str(color_name).lower().strip()
     
-    # Red variations
-    if any(word in color for word in ['red', 'crimson', 'scarlet', 'burgundy', 'ruby', 'cherry', 'rose']):
-        return "Red"
-    # Blue variations  
-    if any(word in color for word in ['blue', 'navy', 'azure', 'cobalt', 'sapphire', 'indigo', 'teal']):
-        return "Blue"
-    # White variations
-    if any(word in color for word in ['white', 'pearl', 'ivory', 'cream', 'snow', 'frost']):
-        return "White"
-    # Black variations
-    if any(word in color for word in ['black', 'ebony', 'coal', 'charcoal', 'onyx', 'midnight']):
-        return "Black"
-    # Silver/Grey variations
-    if any(word in color for word in ['silver', 'grey', 'gray', 'platinum', 'steel', 'graphite', 'titanium']):
-        return "Silver"
-    # Green variations
-    if any(word in color for word in ['green', 'emerald', 'forest', 'sage', 'olive', 'lime']):
-        return "Green"
-    # Yellow/Gold variations
-    if any(word in color for word in ['yellow', 'gold', 'amber', 'champagne', 'bronze']):
-        return "Gold"
-    # Orange variations
-    if any(word in color for word in ['orange', 'copper', 'sunset', 'rust']):
-        return "Orange"
-    # Purple variations
-    if any(word in color for word in ['purple', 'violet', 'magenta', 'plum']):
-        return "Purple"
-    # Brown variations
-    if any(word in color for word in ['brown', 'tan', 'beige', 'mocha', 'coffee', 'chocolate']):
-        return "Brown"
-    
-    # If no match found, try to extract the first recognizable color word
-    color_words = color.split()
-    for word in color_words:
-        if word in ['red', 'blue', 'white', 'black', 'silver', 'green', 'yellow', 'orange', 'purple', 'brown']:
-            return word.capitalize()
-    
+    # Common case: the colour is just one of the keywords.
+    hit = _COLOR_WORDS.get(color)
+    if hit:
+        return hit
+    # Multi-word names made only of keywords ("pearl white"): patterns never span a space and
+    # each keyword already carries its earliest group, so the earliest token group is the answer.
+    labels = [_COLOR_WORDS.get(tok) for tok in color.split()]
+    if labels and all(labels):
+        return min(labels, key=_COLOR_RANK.__getitem__)
+    # Otherwise the first group (in _COLOR_GROUPS order) with a substring match.
+    # Every basic colour word is itself a keyword, so no separate word-by-word fallback is needed.
+    for label, rx in _COLOR_PATTERNS:
+        if rx.search(color):
+            return label
     return ""
+
+def simplify_vehicle_color_series(s: pd.Series) -> pd.Series:
+    """
+    Column-wise simplify_vehicle_color. Colour names repeat heavily, so it runs once per
+    distinct value; per-group .str.contains passes measured slower (pandas still runs the
+    regex element by element on object/str columns).
+    """
+    return _map_unique(s.where(s.notna(), ""), simplify_vehicle_color).astype(object)
@@ -1 +1,6 @@
 # Package init
+import os
+
+# config.py falls back to st.secrets when OPENAI_API_KEY is unset, which raises outside
+# a Streamlit app with no secrets.toml; tests never call OpenAI, so any value will do.
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,56 @@
+"""send_sms_batch: every row is sent once, and closing early stops further sends."""
+import threading
+import unittest
+from unittest import mock
+
+from clients import aircall_client
+
+
+class _FakeSend:
+    """Stands in for send_sms_via_aircall and records which phones were sent."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = []
+
+    def __call__(self, phone, message, number_id=None):
+        with self.lock:
+            self.sent.append(phone)
+        return True, f"sent {message}"
+
+
+def _rows(n):
+    return [(f"+6140000{i:04d}", f"msg {i}") for i in range(n)]
+
+
+class SendSmsBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.fake = _FakeSend()
+        patcher = mock.patch.object(aircall_client, "send_sms_via_aircall", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_run_sends_every_row_once(self):
+        rows = _rows(25)
+        results = list(aircall_client.send_sms_batch(rows, max_workers=4, per_sec=1000))
+        self.assertEqual(sorted(p for p, _, _ in results), sorted(p for p, _ in rows))
+        self.assertTrue(all(ok for _, ok, _ in results))
+        self.assertEqual(sorted(self.fake.sent), sorted(p for p, _ in rows))
+
+    def test_early_close_sends_at_most_max_workers(self):
+        for max_workers in (1, 3, 5):
+            self.fake.sent.clear()
+            gen = aircall_client.send_sms_batch(_rows(20), max_workers=max_workers, per_sec=1000)
+            next(gen)
+            gen.close()
+            with self.subTest(max_workers=max_workers):
+                self.assertGreaterEqual(len(self.fake.sent), 1)
+                self.assertLessEqual(len(self.fake.sent), max_workers)
+
+    def test_empty_rows(self):
+        self.assertEqual(list(aircall_client.send_sms_batch([], per_sec=1000)), [])
+        self.assertEqual(self.fake.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
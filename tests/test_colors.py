@@ -0,0 +1,73 @@
+"""simplify_vehicle_color(_series) vs the original if/any keyword table."""
+import random
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.utils import simplify_vehicle_color, simplify_vehicle_color_series
+
+# The original table, checked top to bottom with substring matches.
+_OLD_TABLE = [
+    ("Red",    ['red', 'crimson', 'scarlet', 'burgundy', 'ruby', 'cherry', 'rose']),
+    ("Blue",   ['blue', 'navy', 'azure', 'cobalt', 'sapphire', 'indigo', 'teal']),
+    ("White",  ['white', 'pearl', 'ivory', 'cream', 'snow', 'frost']),
+    ("Black",  ['black', 'ebony', 'coal', 'charcoal', 'onyx', 'midnight']),
+    ("Silver", ['silver', 'grey', 'gray', 'platinum', 'steel', 'graphite', 'titanium']),
+    ("Green",  ['green', 'emerald', 'forest', 'sage', 'olive', 'lime']),
+    ("Gold",   ['yellow', 'gold', 'amber', 'champagne', 'bronze']),
+    ("Orange", ['orange', 'copper', 'sunset', 'rust']),
+    ("Purple", ['purple', 'violet', 'magenta', 'plum']),
+    ("Brown",  ['brown', 'tan', 'beige', 'mocha', 'coffee', 'chocolate']),
+]
+_OLD_BASIC = ['red', 'blue', 'white', 'black', 'silver', 'green', 'yellow', 'orange', 'purple', 'brown']
+
+
+def _old_simplify_vehicle_color(color_name) -> str:
+    if not color_name or pd.isna(color_name):
+        return ""
+    color = str(color_name).lower().strip()
+    for label, words in _OLD_TABLE:
+        if any(word in color for word in words):
+            return label
+    for word in color.split():
+        if word in _OLD_BASIC:
+            return word.capitalize()
+    return ""
+
+
+_KEYWORDS = [w for _, words in _OLD_TABLE for w in words]
+_FILLER = ["metallic", "mica", "crystal", "soul", "deep", "light", "ice", "ed", "ro", "xx", "Matte"]
+
+
+def _random_colour(rng: random.Random) -> str:
+    words = [rng.choice(_KEYWORDS + _FILLER) for _ in range(rng.randrange(1, 4))]
+    words = [w.upper() if rng.random() < 0.2 else w.capitalize() if rng.random() < 0.3 else w for w in words]
+    return rng.choice([" ", "-", "", "/"]).join(words) + rng.choice(["", " ", "  "])
+
+
+class SimplifyVehicleColorTests(unittest.TestCase):
+    def test_matches_old_table_on_random_colours(self):
+        rng = random.Random(2024)
+        for _ in range(5000):
+            colour = _random_colour(rng)
+            with self.subTest(colour=colour):
+                self.assertEqual(simplify_vehicle_color(colour), _old_simplify_vehicle_color(colour))
+
+    def test_every_keyword_and_pair(self):
+        for a in _KEYWORDS:
+            self.assertEqual(simplify_vehicle_color(a), _old_simplify_vehicle_color(a))
+            for b in _KEYWORDS:
+                colour = f"{a} {b}"
+                self.assertEqual(simplify_vehicle_color(colour), _old_simplify_vehicle_color(colour), colour)
+
+    def test_series_matches_scalar(self):
+        rng = random.Random(5)
+        values = [_random_colour(rng) for _ in range(300)] + ["", None, np.nan]
+        src = pd.Series(values, dtype=object)
+        self.assertEqual(simplify_vehicle_color_series(src).tolist(),
+                         [_old_simplify_vehicle_color(v) for v in values])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Column-wise date helpers (prepare_deals parsing, rel_date_series) vs their scalar versions."""
+import random
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from core.utils import (
+    _date_column,
+    _date_time_columns,
+    parse_epoch_or_iso_to_local_date,
+    parse_epoch_or_iso_to_local_time,
+    rel_date,
+    rel_date_series,
+)
+
+
+def _random_value(rng: random.Random):
+    """One HubSpot-ish date property value: epochs (ms/s, str/int), ISO shapes, blanks, junk."""
+    ms = rng.randrange(1_600_000_000_000, 1_800_000_000_000)
+    return rng.choice([
+        str(ms),
+        ms,
+        str(ms // 1000),
+        f" {ms} ",
+        f"{ms / 1000:.3f}",
+        pd.Timestamp(ms, unit="ms", tz="UTC").isoformat(),
+        pd.Timestamp(ms, unit="ms").strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        pd.Timestamp(ms, unit="ms").strftime("%Y-%m-%d"),
+        None,
+        np.nan,
+        "",
+        "not a date",
+    ])
+
+
+def _none_if_missing(v):
+    # The scalar date parser gives NaT for '' where the column parser gives None.
+    if v is None or v is pd.NaT or (isinstance(v, float) and np.isnan(v)):
+        return None
+    return v
+
+
+class DateColumnTests(unittest.TestCase):
+    def test_matches_scalar_parsers_on_random_frames(self):
+        rng = random.Random(1234)
+        for _ in range(200):
+            values = [_random_value(rng) for _ in range(rng.randrange(1, 40))]
+            src = pd.Series(values, dtype=object, index=rng.sample(range(1000), len(values)))
+            dates = _date_column(src)
+            pair_dates, pair_times = _date_time_columns(src)
+            self.assertTrue(dates.index.equals(src.index))
+            self.assertTrue(pair_times.index.equals(src.index))
+            for v, d, pd_, t in zip(values, dates, pair_dates, pair_times):
+                want_date = _none_if_missing(parse_epoch_or_iso_to_local_date(v))
+                with self.subTest(value=v):
+                    self.assertEqual(_none_if_missing(d), want_date)
+                    self.assertEqual(_none_if_missing(pd_), want_date)
+                    self.assertEqual(t, parse_epoch_or_iso_to_local_time(v))
+
+    def test_all_missing_column_skips_parsing(self):
+        src = pd.Series([None, np.nan], dtype=object)
+        dates, times = _date_time_columns(src)
+        self.assertEqual(_date_column(src).tolist(), [None, None])
+        self.assertEqual(dates.tolist(), [None, None])
+        self.assertEqual(times.tolist(), ["", ""])
+
+
+class RelDateSeriesTests(unittest.TestCase):
+    def test_matches_rel_date_on_random_frames(self):
+        rng = random.Random(99)
+        today = date(2025, 3, 15)
+        for _ in range(100):
+            values = [
+                # prepare_deals' date columns hold datetime.date or None; strings/NaN must give ''.
+                rng.choice([today + timedelta(days=rng.randrange(-40, 40)), None, np.nan, "", "2025-03-15"])
+                for _ in range(rng.randrange(1, 30))
+            ]
+            src = pd.Series(values, dtype=object)
+            got = rel_date_series(src, today)
+            for v, g in zip(values, got):
+                with self.subTest(value=v):
+                    self.assertEqual(g, rel_date(v, today))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""dedupe_users / dedupe_users_with_audit vs a straightforward per-customer loop."""
+import random
+import unittest
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from config import MEL_TZ, STAGE_BOOKED_ID, STAGE_CONDUCTED_ID, STAGE_ENQUIRY_ID
+from core.utils import (
+    dedupe_users,
+    dedupe_users_with_audit,
+    first_nonempty_str,
+    format_date_au,
+    prepare_deals,
+    rel_date,
+    simplify_vehicle_color,
+    stage_label,
+)
+
+_STAGES = [STAGE_ENQUIRY_ID, STAGE_BOOKED_ID, STAGE_CONDUCTED_ID, "999", "", None]
+
+
+def _random_deals(rng: random.Random, n: int) -> pd.DataFrame:
+    """Raw HubSpot-shaped deals; a small pool of phones/emails makes customers repeat."""
+    phones = ["0412 345 678", "+61412345678", "61498765432", "0400000001", "12345", "", None]
+    emails = ["A@x.com", "a@x.com ", "b@y.com", "", None]
+    today = datetime.now(MEL_TZ).date()
+    rows = []
+    for i in range(n):
+        day = today + timedelta(days=rng.randrange(-20, 20))
+        ms = int(datetime(day.year, day.month, day.day, rng.randrange(8, 18), tzinfo=MEL_TZ).timestamp() * 1000)
+        rows.append({
+            "hs_object_id": str(1000 + i),
+            "full_name": rng.choice(["Alice", " Bob ", "", None, "nan"]),
+            "email": rng.choice(emails),
+            "mobile": rng.choice(phones),
+            "phone": rng.choice(phones),
+            "dealstage": rng.choice(_STAGES),
+            "td_booking_slot": rng.choice([str(ms), None]),
+            "td_booking_slot_date": rng.choice([day.isoformat(), None]),
+            "td_booking_slot_time": rng.choice([str(ms), "10:30", None]),
+            "td_conducted_date": rng.choice([str(ms), None]),
+            "vehicle_make": rng.choice(["Mazda", "Kia", "", None]),
+            "vehicle_model": rng.choice(["3", "Cerato", "", None]),
+            "vehicle_year": rng.choice(["2019", "", None]),
+            "vehicle_colour": rng.choice(["Soul Red Crystal", "Snow White Pearl", "", None]),
+            "vehicle_url": rng.choice(["https://c/1", "", None]),
+            "video_url__short_": rng.choice(["https://v/1", "https://v/2", "", None]),
+        })
+    return pd.DataFrame(rows)
+
+
+def _blank(v) -> str:
+    return "" if v is None or v is pd.NA or (isinstance(v, float) and v != v) else str(v)
+
+
+def _reference_dedupe(df: pd.DataFrame, *, use_conducted: bool) -> list[dict]:
+    """The original row-by-row dedupe (VehicleDetails as per-field lists, URLs in first-seen order)."""
+    key = df["phone_norm"].fillna("").astype(str) + "|" + df["email_l"].fillna("").astype(str)
+    out = []
+    for _, grp in df.groupby(key, sort=False):
+        cars, exact, rel, stages, videos = [], [], [], [], []
+        details = {k: [] for k in ("make", "model", "year", "color", "url", "stage_id")}
+        for _, r in grp.iterrows():
+            make, model = _blank(r.get("vehicle_make") or "").strip(), _blank(r.get("vehicle_model") or "").strip()
+            cars.append(f"{make} {model}".strip() or "car")
+            details["make"].append(make)
+            details["model"].append(model)
+            details["year"].append(_blank(r.get("vehicle_year") or "").strip())
+            details["color"].append(simplify_vehicle_color(_blank(r.get("vehicle_colour") or "").strip()))
+            details["url"].append(_blank(r.get("vehicle_url") or "").strip())
+            details["stage_id"].append(_blank(r.get("dealstage") or "").strip())
+            if use_conducted:
+                d, t = r.get("conducted_date_local"), r.get("conducted_time_local") or ""
+            else:
+                d = r.get("slot_date_prop") or r.get("slot_date")
+                t = r.get("slot_time_param") or r.get("slot_time") or ""
+            when_rel = rel_date(d) if isinstance(d, date) else ""
+            exact.append(f"{format_date_au(d)} {t}".strip())
+            rel.append(when_rel if t == "" else f"{when_rel} at {t}".strip())
+            stages.append(_blank(r.get("dealstage") or ""))
+            video = _blank(r.get("video_url__short_") or "").strip()
+            if video:
+                videos.append(video)
+        if STAGE_CONDUCTED_ID in stages: hint = "conducted"
+        elif STAGE_BOOKED_ID in stages: hint = "booked"
+        elif STAGE_ENQUIRY_ID in stages: hint = "enquiry"
+        else: hint = "unknown"
+        out.append({
+            "CustomerName": first_nonempty_str(grp["full_name"]),
+            "Phone": first_nonempty_str(grp["phone_norm"]),
+            "Email": first_nonempty_str(grp["email"]),
+            "DealsCount": len(cars),
+            "Cars": "; ".join(c for c in cars if c),
+            "WhenExact": "; ".join(w for w in exact if w),
+            "WhenRel": "; ".join(w for w in rel if w),
+            "DealStages": "; ".join(sorted({stage_label(x) for x in stages if x} - {""})),
+            "StageHint": hint,
+            "VideoURLs": "; ".join(dict.fromkeys(videos)),
+            "VehicleDetails": details,
+        })
+    return out
+
+
+class DedupeUsersTests(unittest.TestCase):
+    def test_matches_reference_on_random_frames(self):
+        rng = random.Random(7)
+        for trial in range(60):
+            deals = prepare_deals(_random_deals(rng, rng.randrange(1, 40)))
+            for use_conducted in (False, True):
+                with self.subTest(trial=trial, use_conducted=use_conducted):
+                    got = dedupe_users(deals, use_conducted=use_conducted)
+                    want = _reference_dedupe(deals, use_conducted=use_conducted)
+                    self.assertEqual(got.to_dict("records"), want)
+
+    def test_audit_lists_every_deal_after_the_first_per_customer(self):
+        rng = random.Random(11)
+        for trial in range(60):
+            deals = prepare_deals(_random_deals(rng, rng.randrange(1, 40)))
+            base, dropped = dedupe_users_with_audit(deals, use_conducted=False)
+            with self.subTest(trial=trial):
+                self.assertEqual(base.to_dict("records"), dedupe_users(deals, use_conducted=False).to_dict("records"))
+                self.assertEqual(len(base) + len(dropped), len(deals))
+                key = deals["phone_norm"].astype(str) + "|" + deals["email_l"].astype(str)
+                want_ids = []
+                for _, grp in deals.groupby(key, sort=False):
+                    want_ids += grp["hs_object_id"].iloc[1:].tolist()
+                got_ids = dropped["hs_object_id"].tolist() if not dropped.empty else []
+                self.assertEqual(got_ids, want_ids)
+                if not dropped.empty:
+                    self.assertTrue(dropped["Reason"].str.startswith("Deduped under ").all())
+
+    def test_empty_input(self):
+        self.assertTrue(dedupe_users(pd.DataFrame(), use_conducted=False).empty)
+        base, dropped = dedupe_users_with_audit(None, use_conducted=False)
+        self.assertTrue(base.empty and dropped.empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""get_consolidated_notes_for_deals vs per-deal get_consolidated_notes_for_deal, against a fake HubSpot."""
+import random
+import re
+import unittest
+from unittest import mock
+
+from clients import hubspot_client
+
+
+class _Resp:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+
+class _FakeHubSpot:
+    """Serves the association, note and owner endpoints the notes helpers call, from in-memory dicts."""
+
+    def __init__(self, rng: random.Random, n_deals: int):
+        self.owners = {str(o): {"firstName": rng.choice(["Ann", "Bo", ""]), "lastName": rng.choice(["Lee", ""]),
+                                "email": f"o{o}@example.com"} for o in range(1, 5)}
+        contacts = [str(1000 + c) for c in range(max(2, n_deals // 2))]
+        # Contacts are shared between deals, as repeat customers are.
+        self.deal_contacts = {str(d): rng.sample(contacts, rng.randrange(0, 3)) for d in range(1, n_deals + 1)}
+        self.notes = {}
+        self.contact_notes = {}
+        for c in contacts:
+            ids = []
+            for _ in range(rng.randrange(0, 5)):
+                nid = str(50000 + len(self.notes))
+                self.notes[nid] = {
+                    "hs_note_body": rng.choice(["", "   ", "<p>Called&nbsp;back</p>", "Test drive &amp; finance",
+                                                "<br>", f"note {nid}"]),
+                    "hs_timestamp": rng.choice([str(1735689600000 + int(nid) * 60000), "1735689600", None, "soon"]),
+                    "hs_createdate": "2025-01-01T00:00:00Z",
+                    "hubspot_owner_id": rng.choice([None, "1", "2", "3", "4", "99"]),
+                }
+                ids.append(nid)
+            self.contact_notes[c] = ids
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        if m := re.search(r"/crm/v3/objects/deals/(\w+)/associations/contacts$", url):
+            return _Resp({"results": [{"toObjectId": int(c)} for c in self.deal_contacts.get(m[1], [])]})
+        if m := re.search(r"/crm/v3/objects/contacts/(\w+)/associations/notes$", url):
+            return _Resp({"results": [{"toObjectId": int(n)} for n in self.contact_notes.get(m[1], [])]})
+        if m := re.search(r"/crm/v3/owners/(\w+)$", url):
+            return _Resp(self.owners[m[1]]) if m[1] in self.owners else _Resp({}, 404)
+        raise AssertionError(f"unexpected GET {url}")
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        ids = [i["id"] for i in json["inputs"]]
+        assert len(ids) <= 100, "HubSpot batch reads take at most 100 ids"
+        if url.endswith("/crm/v3/objects/notes/batch/read"):
+            return _Resp({"results": [{"id": n, "properties": self.notes[n]} for n in ids if n in self.notes]})
+        if m := re.search(r"/crm/v4/associations/(\w+)/(\w+)/batch/read$", url):
+            links = {("deals", "contacts"): self.deal_contacts, ("contacts", "notes"): self.contact_notes}[m.groups()]
+            return _Resp({"results": [{"from": {"id": i}, "to": [{"toObjectId": int(t)} for t in links[i]]}
+                                      for i in ids if links.get(i)]}, 207)
+        raise AssertionError(f"unexpected POST {url}")
+
+
+class ConsolidatedNotesTests(unittest.TestCase):
+    def _check(self, seed, n_deals):
+        fake = _FakeHubSpot(random.Random(seed), n_deals)
+        deal_ids = list(fake.deal_contacts) + ["999999"]  # plus a deal HubSpot knows nothing about
+        with mock.patch.object(hubspot_client.requests, "get", fake.get), \
+             mock.patch.object(hubspot_client.requests, "post", fake.post):
+            expected = {d: hubspot_client.get_consolidated_notes_for_deal(d) for d in deal_ids}
+            got = hubspot_client.get_consolidated_notes_for_deals(deal_ids)
+        self.assertEqual(got, expected)
+
+    def test_matches_per_deal_on_random_accounts(self):
+        for seed in range(40):
+            with self.subTest(seed=seed):
+                self._check(seed, n_deals=random.Random(seed).randrange(1, 30))
+
+    def test_more_than_one_batch(self):
+        self._check(7, n_deals=260)
+
+    def test_empty(self):
+        self.assertEqual(hubspot_client.get_consolidated_notes_for_deals([]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""normalize_phone_series vs the scalar normalize_phone."""
+import random
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.utils import normalize_phone, normalize_phone_series
+
+
+def _random_phone(rng: random.Random):
+    """A phone-ish value in one of the accepted AU mobile shapes, a near miss, or junk."""
+    nine = "4" + "".join(rng.choice("0123456789") for _ in range(8))
+    return rng.choice([
+        "+61" + nine,
+        "61" + nine,
+        "0" + nine,
+        nine,
+        "+61 " + nine[:3] + " " + nine[3:6] + " " + nine[6:],
+        "(0" + nine[:3] + ") " + nine[3:6] + "-" + nine[6:],
+        "  +61" + nine + "  ",
+        "+610" + nine,          # one digit too many
+        "0" + nine[:-1],        # one digit short
+        "03" + nine[1:],        # landline prefix
+        "+44" + nine,
+        "61" + nine + "9",
+        "abc",
+        "",
+        None,
+        np.nan,
+        int("61" + nine),
+        "٠" + nine,       # Arabic-Indic zero: \D keeps Unicode digits, like the scalar path
+    ])
+
+
+class NormalizePhoneSeriesTests(unittest.TestCase):
+    def test_matches_scalar_on_random_frames(self):
+        rng = random.Random(42)
+        for _ in range(300):
+            values = [_random_phone(rng) for _ in range(rng.randrange(1, 30))]
+            src = pd.Series(values, dtype=object, index=rng.sample(range(1000), len(values)))
+            got = normalize_phone_series(src)
+            self.assertTrue(got.index.equals(src.index))
+            for v, g in zip(values, got):
+                with self.subTest(value=v):
+                    self.assertEqual(g, normalize_phone(v))
+
+    def test_all_canonical_passes_through(self):
+        src = pd.Series(["+61412345678", "+61498765432"])
+        self.assertEqual(normalize_phone_series(src).tolist(), src.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
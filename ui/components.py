@@ -25,13 +25,18 @@ def show_removed_table(df: pd.DataFrame, title: str):
 
 # ---- render_trimmed ----
 
+# render_trimmed column widths by source column; anything else gets the default.
+_TRIMMED_COL_WIDTHS = {"hs_object_id": 120, "appointment_id": 120, "full_name": 200, "email": 200,
+                       "vehicle_make": 150, "vehicle_model": 150}
+_TRIMMED_DEFAULT_WIDTH = 120
+
 def render_trimmed(df: pd.DataFrame, title: str, cols_map: list[tuple[str,str]]):
     st.markdown(f"#### <span style='color:#000000;'>{title}</span>", unsafe_allow_html=True)
     if df is None or df.empty:
         st.info("No rows to show."); return
-    disp = df.copy()
+    disp = df
     if "dealstage" in disp.columns and "Stage" not in disp.columns:
-        disp["Stage"] = disp["dealstage"].apply(stage_label)
+        disp = disp.assign(Stage=disp["dealstage"].apply(stage_label))
     selected, rename = [], {}
     for col,label in cols_map:
         if col in disp.columns:
@@ -42,16 +47,10 @@ def render_trimmed(df: pd.DataFrame, title: str, cols_map: list[tuple[str,str]])
             rename["Stage"] = label or "Stage"
     
     # Configure column widths based on content type
-    column_config = {}
-    for col in selected:
-        if col in ["hs_object_id", "appointment_id"]:
-            column_config[rename.get(col, col)] = st.column_config.TextColumn(rename.get(col, col), width=120)
-        elif col in ["full_name", "email"]:
-            column_config[rename.get(col, col)] = st.column_config.TextColumn(rename.get(col, col), width=200)
-        elif col in ["vehicle_make", "vehicle_model"]:
-            column_config[rename.get(col, col)] = st.column_config.TextColumn(rename.get(col, col), width=150)
-        else:
-            column_config[rename.get(col, col)] = st.column_config.TextColumn(rename.get(col, col), width=120)
+    column_config = {
+        rename.get(col, col): st.column_config.TextColumn(rename.get(col, col), width=_TRIMMED_COL_WIDTHS.get(col, _TRIMMED_DEFAULT_WIDTH))
+        for col in selected
+    }
     
     st.dataframe(
         disp[selected].rename(columns=rename), 
@@ -72,11 +71,13 @@ def render_selectable_messages(messages_df: pd.DataFrame, key: str) -> pd.DataFr
     if messages_df is None or messages_df.empty:
         st.info("No messages to preview."); return pd.DataFrame()
 
-    view_df = messages_df[["CustomerName","Phone","Message"]].rename(
-        columns={"CustomerName":"Customer","Message":"SMS draft"}
-    ).copy()
-    if "Send" not in view_df.columns:
-        view_df.insert(0, "Send", False)  # default UNCHECKED
+    # Built straight from the source columns: no subset/rename/copy intermediates.
+    view_df = pd.DataFrame({
+        "Send": False,  # default UNCHECKED
+        "Customer": messages_df["CustomerName"],
+        "Phone": messages_df["Phone"],
+        "SMS draft": messages_df["Message"],
+    })
 
     edited = st.data_editor(
         view_df,
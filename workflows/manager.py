@@ -27,14 +27,10 @@ def view_manager():
         else:
             with c2: d1 = st.date_input("Start date", value=today - timedelta(days=7))
             with c3: d2 = st.date_input("End date",   value=today)
-        state_options = hs_get_deal_property_options("car_location_at_time_of_sale")
-        values = [o["value"] for o in state_options] if state_options else []
-        labels = [o["label"] for o in state_options] if state_options else []
-        def_val = "VIC" if "VIC" in values else (values[0] if values else "")
+        labels, label_to_val, def_idx, def_val = hs_state_select_options("car_location_at_time_of_sale")
         with c4:
             if labels:
-                chosen_label = st.selectbox("Vehicle state", labels, index=(values.index("VIC") if "VIC" in values else 0))
-                label_to_val = {o["label"]:o["value"] for o in state_options}
+                chosen_label = st.selectbox("Vehicle state", labels, index=def_idx)
                 mgr_state_val = label_to_val.get(chosen_label, def_val)
             else:
                 mgr_state_val = st.text_input("Vehicle state", value=def_val)
@@ -54,40 +50,20 @@ def view_manager():
         deals0 = prepare_deals(raw)
 
         # 2) Exclude contacts with other ACTIVE purchase deals
-        kept = deals0.copy()
+        # Boolean .loc already returns new frames; Reason goes on via assign, so no extra copies.
+        kept = deals0
         if not kept.empty:
             deal_ids = kept.get("hs_object_id", pd.Series(dtype=str)).dropna().astype(str).tolist()
-            d2c = hs_deals_to_contacts_map(deal_ids)
-            contact_ids = sorted({cid for cids in d2c.values() for cid in cids})
-            c2d = hs_contacts_to_deals_map(contact_ids)
-            other_deal_ids = sorted({did for _, dlist in c2d.items() for did in dlist if did not in deal_ids})
-            stage_map = hs_batch_read_deals(other_deal_ids, props=["dealstage"])
-
-            exclude_contacts = set()
-            for cid, dlist in c2d.items():
-                for did in dlist:
-                    if did in deal_ids: continue
-                    stage = (stage_map.get(did, {}) or {}).get("dealstage")
-                    if stage and str(stage) in ACTIVE_PURCHASE_STAGE_IDS:
-                        exclude_contacts.add(cid); break
-
-            def keep_row(row):
-                d_id = str(row.get("hs_object_id") or "")
-                cids = d2c.get(d_id, [])
-                return not any((c in exclude_contacts) for c in cids)
-
-            kept["__keep"] = kept.apply(keep_row, axis=1)
-            dropped_active = kept[~kept["__keep"]].drop(columns=["__keep"]).copy()
-            kept = kept[kept["__keep"]].drop(columns=["__keep"]).copy()
+            excluded_ids = hs_active_purchase_excluded_deal_ids(deal_ids)
+            drop = kept["hs_object_id"].astype(str).isin(excluded_ids)
+            dropped_active = kept.loc[drop]
+            kept = kept.loc[~drop]
             if not dropped_active.empty:
-                dropped_active["Reason"] = "Contact has another active purchase deal"
+                dropped_active = dropped_active.assign(Reason="Contact has another active purchase deal")
                 show_removed_table(dropped_active, "Removed (active purchase on another deal)")
 
-        # 3) Filter internal/test emails + callout
-        deals_f, removed_internal = filter_internal_test_emails(kept)
-
-        # 4) Audit dedupe
-        dedup, dedupe_dropped = dedupe_users_with_audit(deals_f, use_conducted=True)
+        # 3) Filter internal/test emails + callout, 4) Audit dedupe (cached on the deal frame)
+        deals_f, removed_internal, dedup, dedupe_dropped = filter_and_dedupe(kept, use_conducted=True)
 
         # 5) Build messages + audit
         msgs, skipped_msgs = build_messages_with_audit(dedup, mode="manager")
@@ -143,11 +119,9 @@ def view_manager():
             else:
                 st.info("Sending messages…")
                 sent, failed = 0, 0
-                for _, r in to_send.iterrows():
-                    ok, msg = send_sms_via_aircall(r["Phone"], r["SMS draft"], AIRCALL_NUMBER_ID_2)
-                    if ok: sent += 1; st.success(f"✅ Sent to {r['Phone']}")
-                    else:  failed += 1; st.error(f"❌ Failed for {r['Phone']}: {msg}")
-                    time.sleep(1)
+                for phone, ok, msg in send_sms_batch(zip(to_send["Phone"], to_send["SMS draft"]), AIRCALL_NUMBER_ID_2):
+                    if ok: sent += 1; st.success(f"✅ Sent to {phone}")
+                    else:  failed += 1; st.error(f"❌ Failed for {phone}: {msg}")
                 if sent: st.balloons()
                 st.success(f"🎉 Done! Sent: {sent} | Failed: {failed}")
 
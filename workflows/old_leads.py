@@ -11,6 +11,9 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def view_old():
@@ -34,72 +37,32 @@ def view_old():
 
             # Exclude contacts with other ACTIVE purchase deals (existing logic)
             deal_ids = deals.get("hs_object_id", pd.Series(dtype=str)).dropna().astype(str).tolist()
-            print(f"DEBUG: Checking {len(deal_ids)} deals: {deal_ids}")
-            
-            d2c = hs_deals_to_contacts_map(deal_ids)
-            print(f"DEBUG: Deal-to-contact mapping: {d2c}")
-            
-            contact_ids = sorted({cid for cids in d2c.values() for cid in cids})
-            print(f"DEBUG: Found {len(contact_ids)} contacts: {contact_ids}")
-            
-            c2d = hs_contacts_to_deals_map(contact_ids)
-            print(f"DEBUG: Contact-to-deals mapping:")
-            for cid, deal_list in c2d.items():
-                print(f"  Contact {cid}: {deal_list}")
-            
-            other_deal_ids = sorted({did for _, dlist in c2d.items() for did in dlist if did not in deal_ids})
-            print(f"DEBUG: Found {len(other_deal_ids)} other deals to check stages")
-            
-            stage_map = hs_batch_read_deals(other_deal_ids, props=["dealstage"])
-            print(f"DEBUG: Retrieved stages for {len(stage_map)} deals")
-
-            exclude_contacts = set()
-            for cid, dlist in c2d.items():
-                active_deals = []
-                for did in dlist:
-                    if did in deal_ids: continue
-                    stage = (stage_map.get(did, {}) or {}).get("dealstage")
-                    if stage and str(stage) in ACTIVE_PURCHASE_STAGE_IDS:
-                        active_deals.append(f"{did}({stage})")
-                        exclude_contacts.add(cid)
-                        
-                if active_deals:
-                    print(f"DEBUG: Excluding contact {cid} - active purchases: {active_deals}")
-
-            print(f"DEBUG: Total contacts to exclude: {len(exclude_contacts)}")
-
-            def keep_row(row):
-                d_id = str(row.get("hs_object_id") or "")
-                cids = d2c.get(d_id, [])
-                should_exclude = any((c in exclude_contacts) for c in cids)
-                if should_exclude:
-                    print(f"DEBUG: Excluding deal {d_id} - contact(s) {cids} have active purchases")
-                return not should_exclude
-
-            kept = deals.copy()
+            excluded_ids = hs_active_purchase_excluded_deal_ids(deal_ids)
+
+            # Boolean .loc already returns new frames; Reason goes on via assign, so no extra copies.
+            kept = deals
             if not deals.empty:
-                kept["__keep"] = kept.apply(keep_row, axis=1)
-                dropped_active = kept[~kept["__keep"]].drop(columns=["__keep"]).copy()
-                kept = kept[kept["__keep"]].drop(columns=["__keep"]).copy()
+                drop = kept["hs_object_id"].astype(str).isin(excluded_ids)
+                if drop.any() and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Excluding deals with active purchases on their contacts: %s",
+                                 kept.loc[drop, "hs_object_id"].tolist())
+                dropped_active = kept.loc[drop]
+                kept = kept.loc[~drop]
                 if not dropped_active.empty:
-                    dropped_active["Reason"] = "Contact has another active purchase deal"
+                    dropped_active = dropped_active.assign(Reason="Contact has another active purchase deal")
                     show_removed_table(dropped_active, "Removed (active purchase on another deal)")
 
             # Exclude FUTURE td_booking_slot_date (active upcoming booking)
             today_mel = datetime.now(MEL_TZ).date()
-            kept["slot_date_prop"] = kept["td_booking_slot_date"].apply(parse_epoch_or_iso_to_local_date)
-            future_mask = kept["slot_date_prop"].apply(lambda d: isinstance(d, date) and d > today_mel)
-            kept_no_future = kept[~future_mask].copy()
+            # prepare_deals already parsed slot_date_prop column-wise (date or None); missing -> NaT compares False.
+            future_mask = pd.to_datetime(kept["slot_date_prop"], errors="coerce") > pd.Timestamp(today_mel)
+            kept_no_future = kept.loc[~future_mask]
             if future_mask.any():
-                future_rows = kept[future_mask].copy()
-                future_rows["Reason"] = "Future TD booking date — likely upcoming appointment"
+                future_rows = kept.loc[future_mask].assign(Reason="Future TD booking date — likely upcoming appointment")
                 show_removed_table(future_rows, "Removed (future bookings)")
 
-            # 1) Filter internal/test emails + callout
-            deals_f, removed_internal = filter_internal_test_emails(kept_no_future)
-
-            # 2) Dedupe audit
-            dedup, dedupe_dropped = dedupe_users_with_audit(deals_f, use_conducted=False)
+            # 1) Filter internal/test emails + callout, 2) Dedupe audit (cached on the deal frame)
+            deals_f, removed_internal, dedup, dedupe_dropped = filter_and_dedupe(kept_no_future, use_conducted=False)
 
             # 3) Messages audit
             msgs, skipped_msgs = build_messages_with_audit(dedup, mode="oldlead")
@@ -156,11 +119,9 @@ def view_old():
             else:
                 st.info("Sending messages…")
                 sent, failed = 0, 0
-                for _, r in to_send.iterrows():
-                    ok, msg = send_sms_via_aircall(r["Phone"], r["SMS draft"], AIRCALL_NUMBER_ID_2)
-                    if ok: sent += 1; st.success(f"✅ Sent to {r['Phone']}")
-                    else:  failed += 1; st.error(f"❌ Failed for {r['Phone']}: {msg}")
-                    time.sleep(1)
+                for phone, ok, msg in send_sms_batch(zip(to_send["Phone"], to_send["SMS draft"]), AIRCALL_NUMBER_ID_2):
+                    if ok: sent += 1; st.success(f"✅ Sent to {phone}")
+                    else:  failed += 1; st.error(f"❌ Failed for {phone}: {msg}")
                 if sent: st.balloons()
                 st.success(f"🎉 Done! Sent: {sent} | Failed: {failed}")
 
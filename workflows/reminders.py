@@ -26,6 +26,11 @@ from core.roster import *
 
 MEL_TZ = ZoneInfo("Australia/Melbourne")
 
+# Static HTML used on every rerun of the view.
+_FORM_ROW_OPEN  = '<div class="form-row">'
+_FORM_ROW_CLOSE = "</div>"
+_SEARCH_BADGE   = "<span style='background:#4436F5;color:#FFFFFF;padding:4px 8px;border-radius:6px;'>Searching HubSpot…</span>"
+
 
 # -------------------------------------------
 # Helper: show rows we excluded (audit table)
@@ -51,6 +56,60 @@ def _show_removed_table(df: pd.DataFrame, title: str):
     )
 
 
+# ---------------------------------------------
+# Display projections (built once per fetch)
+# ---------------------------------------------
+_FILTERED_DEALS_COLS = [
+    "hs_object_id","appointment_id","full_name","email","phone_norm",
+    "vehicle_make","vehicle_model","slot_date_prop","slot_time_param",
+    "video_url__short_","td_reminder_sms_sent","Stage"
+]
+_FILTERED_DEALS_RENAME = {
+    "hs_object_id":"Deal ID",
+    "appointment_id":"Appointment ID",
+    "full_name":"Customer",
+    "phone_norm":"Phone",
+    "vehicle_make":"Make",
+    "vehicle_model":"Model",
+    "slot_date_prop":"TD booking date",
+    "slot_time_param":"Time",
+    "video_url__short_":"Video URL"
+}
+_DEDUPED_COLS = [
+    "CustomerName","Phone","Email","DealsCount",
+    "Cars","WhenExact","DealStages","SalesAssociate","SalesEmail","VideoURLs"
+]
+
+def _filtered_deals_view(deals_f: pd.DataFrame) -> pd.DataFrame | None:
+    """'Filtered deals (trimmed)' table: display columns only, with a readable Stage."""
+    if not isinstance(deals_f, pd.DataFrame) or deals_f.empty:
+        return None
+    disp = deals_f
+    if "dealstage" in disp.columns and "Stage" not in disp.columns:
+        disp = disp.assign(Stage=disp["dealstage"].apply(stage_label))
+    return disp[[c for c in _FILTERED_DEALS_COLS if c in disp.columns]].rename(columns=_FILTERED_DEALS_RENAME)
+
+def _deduped_view(dedup: pd.DataFrame) -> pd.DataFrame | None:
+    """'Deduped list' table: display columns only."""
+    if not isinstance(dedup, pd.DataFrame) or dedup.empty:
+        return None
+    return dedup[[c for c in _DEDUPED_COLS if c in dedup.columns]].rename(
+        columns={"WhenExact":"When (exact)","DealStages":"Stage(s)"})
+
+def _preview_view(msgs: pd.DataFrame) -> pd.DataFrame | None:
+    """'Message Preview' editor frame: Send ticks (all off) + Customer/Phone/SalesAssociate/SMS draft."""
+    if not isinstance(msgs, pd.DataFrame) or msgs.empty:
+        return None
+    # Built straight from the four source columns: no subset/rename/copy intermediates.
+    return pd.DataFrame({
+        "Send": False,
+        "Customer": msgs["CustomerName"],
+        "Phone": msgs["Phone"],
+        "SalesAssociate": msgs["SalesAssociate"],
+        "SMS draft": msgs["Message"],
+    })
+
+
 # ---------------------------------------------------------
 # Message builder: specifically for Reminders + Associates
 # ---------------------------------------------------------
@@ -71,48 +130,39 @@ def _build_messages_for_reminders_with_associates(dedup_df: pd.DataFrame) -> pd.
             "Cars","WhenExact","WhenRel","DealStages","Message"
         ])
 
-    out_rows = []
-    for _, row in dedup_df.iterrows():
-        phone = str(row.get("Phone") or "").strip()
-        if not phone:
-            # We exclude rows without a phone here; they’ll be captured in “skipped”.
-            continue
-
-        name         = str(row.get("CustomerName") or "").strip()
-        cars         = str(row.get("Cars") or "").strip()
-        when_rel     = str(row.get("WhenRel") or "").strip()
-        video_urls   = str(row.get("VideoURLs") or "").strip()
-        associate    = str(row.get("SalesAssociate") or "").strip()
-        associate_em = str(row.get("SalesEmail") or "").strip()
-
-        # Build “car + relative time” pairs for the prompt, e.g. “Mazda 3 tomorrow; Kia Cerato today at 13:00”
-        pairs_text = build_pairs_text(cars, when_rel)
-
-        # Use associate-personalised reminder
-        msg = draft_sms_reminder_associate(
+    # Whole-column text (same str(v or "") rule as the old per-row reads), then drop phone-less rows
+    # once; they’ll be captured in “skipped”.
+    strip_cols = ("CustomerName","Phone","Email","SalesAssociate","SalesEmail","Cars","WhenRel","VideoURLs")
+    cols = {c: text_column(dedup_df, c, strip=c in strip_cols).tolist() for c in strip_cols + ("WhenExact","DealStages")}
+    cols["pairs"] = build_pairs_text_batch(dedup_df["Cars"], dedup_df["WhenRel"]).tolist()
+    keep = [i for i, phone in enumerate(cols["Phone"]) if phone]
+    if len(keep) < len(dedup_df):
+        cols = {c: [vals[i] for i in keep] for c, vals in cols.items()}
+
+    # Use associate-personalised reminder; pairs are “car + relative time”, e.g. “Mazda 3 tomorrow; Kia Cerato today at 13:00”
+    messages = [
+        draft_sms_reminder_associate(
             name=name,
             pairs_text=pairs_text,
             associate_name=associate,        # signed by the associate (not “–Cars24 Laverton”)
             video_urls=video_urls            # keep the video URL rules as-is
         )
+        for name, pairs_text, associate, video_urls
+        in zip(cols["CustomerName"], cols["pairs"], cols["SalesAssociate"], cols["VideoURLs"])
+    ]
 
-        out_rows.append({
-            "CustomerName": name,
-            "Phone": phone,
-            "Email": str(row.get("Email") or "").strip(),
-            "SalesAssociate": associate,
-            "SalesEmail": associate_em,
-            "Cars": cars,
-            "WhenExact": str(row.get("WhenExact") or ""),
-            "WhenRel": when_rel,
-            "DealStages": str(row.get("DealStages") or ""),
-            "Message": msg
-        })
-
-    return pd.DataFrame(out_rows, columns=[
-        "CustomerName","Phone","Email","SalesAssociate","SalesEmail",
-        "Cars","WhenExact","WhenRel","DealStages","Message"
-    ])
+    return pd.DataFrame({
+        "CustomerName": cols["CustomerName"],
+        "Phone": cols["Phone"],
+        "Email": cols["Email"],
+        "SalesAssociate": cols["SalesAssociate"],
+        "SalesEmail": cols["SalesEmail"],
+        "Cars": cols["Cars"],
+        "WhenExact": cols["WhenExact"],
+        "WhenRel": cols["WhenRel"],
+        "DealStages": cols["DealStages"],
+        "Message": messages,
+    })
 
 
 # -----------------------------------
@@ -125,7 +175,7 @@ def view_reminders():
     # 1) Top form: date + state + associates
     # ----------------------------
     with st.form("reminders_form"):
-        st.markdown('<div class="form-row">', unsafe_allow_html=True)
+        st.markdown(_FORM_ROW_OPEN, unsafe_allow_html=True)
         c1, c2, c3 = st.columns([2, 2, 1])
 
         # Date of the booking we’re reminding for
@@ -133,18 +183,11 @@ def view_reminders():
             rem_date = st.date_input("TD booking date", value=datetime.now(MEL_TZ).date())
 
         # State selector (HubSpot property options)
-        state_options = hs_get_deal_property_options("car_location_at_time_of_sale")
-        values = [o["value"] for o in state_options] if state_options else []
-        labels = [o["label"] for o in state_options] if state_options else []
-        def_val = "VIC" if "VIC" in values else (values[0] if values else "")
+        labels, label_to_val, def_idx, def_val = hs_state_select_options("car_location_at_time_of_sale")
 
         with c2:
             if labels:
-                chosen_label = st.selectbox(
-                    "Vehicle state", labels,
-                    index=(values.index("VIC") if "VIC" in values else 0)
-                )
-                label_to_val = {o["label"]: o["value"] for o in state_options}
+                chosen_label = st.selectbox("Vehicle state", labels, index=def_idx)
                 rem_state_val = label_to_val.get(chosen_label, def_val)
             else:
                 rem_state_val = st.text_input("Vehicle state", value=def_val)
@@ -155,7 +198,7 @@ def view_reminders():
             chosen_names = st.multiselect(
                 "Available associates", all_names, default=all_names
             )
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown(_FORM_ROW_CLOSE, unsafe_allow_html=True)
 
         go = st.form_submit_button("Fetch deals", use_container_width=True)
 
@@ -163,10 +206,7 @@ def view_reminders():
     # 2) On submit: fetch + filter
     # ----------------------------
     if go:
-        st.markdown(
-            "<span style='background:#4436F5;color:#FFFFFF;padding:4px 8px;border-radius:6px;'>Searching HubSpot…</span>",
-            unsafe_allow_html=True
-        )
+        st.markdown(_SEARCH_BADGE, unsafe_allow_html=True)
 
         # Search deals in HubSpot for the selected booking date
         eq_ms, _ = mel_day_bounds_to_epoch_ms(rem_date)
@@ -187,11 +227,9 @@ def view_reminders():
         # B) Removed because another deal with same car (via appointment_id) is in active purchase
         deals_car_filtered, dropped_car_purchases = filter_deals_by_appointment_id_car_active_purchases(deals_not_sent)
 
-        # C) Removed because internal/test domains
-        deals_f, removed_internal = filter_internal_test_emails(deals_car_filtered)
-
-        # D) Dedup (and keep an audit list of what was collapsed)
-        dedup, dedupe_dropped = dedupe_users_with_audit(deals_f, use_conducted=False)
+        # C) Removed because internal/test domains, D) Dedup with an audit list of what was collapsed
+        # (cached on the deal frame)
+        deals_f, removed_internal, dedup, dedupe_dropped = filter_and_dedupe(deals_car_filtered, use_conducted=False)
 
         # E) NEW: Round-robin assignment to associates the user selected
         selected_associates = get_associates_by_names(chosen_names)
@@ -213,91 +251,64 @@ def view_reminders():
         st.session_state["reminders_dedup"] = dedup
         st.session_state["reminders_dedupe_dropped"] = dedupe_dropped
         st.session_state["reminders_msgs"] = msgs
+        # Phone -> deal IDs for the post-send HubSpot update; depends only on msgs/deals_f
+        st.session_state["reminders_phone_to_deals"] = get_all_deal_ids_for_contacts(msgs, deals_f)
+        # Display projections only change on fetch, so build them here rather than on every rerun.
+        st.session_state["reminders_deals_view"] = _filtered_deals_view(deals_f)
+        st.session_state["reminders_dedup_view"] = _deduped_view(dedup)
+        st.session_state["reminders_preview_view"] = _preview_view(msgs)
 
     # ----------------------------
     # 3) Render from session
     # ----------------------------
-    deals_f      = st.session_state.get("reminders_deals")
+    _render_reminders_results()
+
+
+# Fragment: ticking rows in the editor or pressing Send reruns only this block,
+# not the form/fetch section above; everything is read back from session_state.
+@st.fragment
+def _render_reminders_results():
     removed_sms  = st.session_state.get("reminders_removed_sms_sent")
     dropped_car  = st.session_state.get("reminders_dropped_car_purchases")
     removed_int  = st.session_state.get("reminders_removed_internal")
-    dedup        = st.session_state.get("reminders_dedup")
     dedupe_drop  = st.session_state.get("reminders_dedupe_dropped")
-    msgs         = st.session_state.get("reminders_msgs")
-
-    # Store phone-to-deals mapping for later update
-    st.session_state["reminders_phone_to_deals"] = get_all_deal_ids_for_contacts(msgs, deals_f) 
+    deals_view   = st.session_state.get("reminders_deals_view")
+    dedup_view   = st.session_state.get("reminders_dedup_view")
+    preview_view = st.session_state.get("reminders_preview_view")
 
 
     # Show trimmed-out rows FIRST, with reasons
     if isinstance(removed_sms, pd.DataFrame) and not removed_sms.empty:
         st.warning(f"⚠️ {len(removed_sms)} deals excluded — SMS already sent")
-        _show_removed_table(removed_sms, "Removed (SMS reminder already sent)")
-    if isinstance(dropped_car, pd.DataFrame) and not dropped_car.empty:
-        _show_removed_table(dropped_car, "Removed (car has another active purchase deal via appointment_id)")
-    if isinstance(removed_int, pd.DataFrame) and not removed_int.empty:
-        _show_removed_table(removed_int, "Removed by domain filter (cars24.com / yopmail.com)")
+    for removed, title in (
+        (removed_sms, "Removed (SMS reminder already sent)"),
+        (dropped_car, "Removed (car has another active purchase deal via appointment_id)"),
+        (removed_int, "Removed by domain filter (cars24.com / yopmail.com)"),
+    ):
+        if isinstance(removed, pd.DataFrame) and not removed.empty:
+            _show_removed_table(removed, title)
 
     # Show filtered (kept) trimmed table
-    if isinstance(deals_f, pd.DataFrame) and not deals_f.empty:
-        disp = deals_f.copy()
-        if "dealstage" in disp.columns and "Stage" not in disp.columns:
-            disp["Stage"] = disp["dealstage"].apply(stage_label)
+    if isinstance(deals_view, pd.DataFrame) and not deals_view.empty:
         st.markdown("#### Filtered deals (trimmed)")
-        st.dataframe(
-            disp[[
-                c for c in [
-                    "hs_object_id","appointment_id","full_name","email","phone_norm",
-                    "vehicle_make","vehicle_model","slot_date_prop","slot_time_param",
-                    "video_url__short_","td_reminder_sms_sent","Stage"
-                ] if c in disp.columns
-            ]].rename(columns={
-                "hs_object_id":"Deal ID",
-                "appointment_id":"Appointment ID",
-                "full_name":"Customer",
-                "phone_norm":"Phone",
-                "vehicle_make":"Make",
-                "vehicle_model":"Model",
-                "slot_date_prop":"TD booking date",
-                "slot_time_param":"Time",
-                "video_url__short_":"Video URL"
-            }),
-            use_container_width=True, height=380
-        )
+        st.dataframe(deals_view, use_container_width=True, height=380)
 
     # Show dedup results
     if isinstance(dedupe_drop, pd.DataFrame) and not dedupe_drop.empty:
         _show_removed_table(dedupe_drop, "Collapsed during dedupe (duplicates)")
 
-    if isinstance(dedup, pd.DataFrame) and not dedup.empty:
+    if isinstance(dedup_view, pd.DataFrame) and not dedup_view.empty:
         st.markdown("#### Deduped list (by mobile|email)")
-        st.dataframe(
-            dedup[[
-                c for c in [
-                    "CustomerName","Phone","Email","DealsCount",
-                    "Cars","WhenExact","DealStages","SalesAssociate","SalesEmail","VideoURLs"
-                ] if c in dedup.columns
-            ]].rename(columns={"WhenExact":"When (exact)","DealStages":"Stage(s)"}),
-            use_container_width=True
-        )
+        st.dataframe(dedup_view, use_container_width=True)
 
     # Show Message Preview with Sales Associate column
     edited = pd.DataFrame()
-    if isinstance(msgs, pd.DataFrame) and not msgs.empty:
+    if isinstance(preview_view, pd.DataFrame) and not preview_view.empty:
         st.markdown("#### Message Preview (Reminders)")
-        # We render the preview inline to ensure SalesAssociate is shown between Phone and SMS
-        view_df = msgs[[
-            "CustomerName","Phone","SalesAssociate","Message"
-        ]].rename(columns={
-            "CustomerName":"Customer",
-            "Message":"SMS draft"
-        }).copy()
-
-        if "Send" not in view_df.columns:
-            view_df.insert(0, "Send", False)
-
+        # We render the preview inline to ensure SalesAssociate is shown between Phone and SMS.
+        # The base frame is built once per fetch; ticks/edits live in the editor's widget state.
         edited = st.data_editor(
-            view_df,
+            preview_view,
             key="editor_reminders",
             use_container_width=True,
             height=420,
@@ -327,37 +338,29 @@ def view_reminders():
             sent, failed = 0, 0
             sent_phones = []  # Track which phones were sent successfully
             
-            for _, r in to_send.iterrows():
-                ok, msg = send_sms_via_aircall(r["Phone"], r["SMS draft"], AIRCALL_NUMBER_ID)
+            for phone, ok, msg in send_sms_batch(zip(to_send["Phone"], to_send["SMS draft"]), AIRCALL_NUMBER_ID):
                 if ok: 
                     sent += 1
-                    sent_phones.append(r["Phone"])
-                    st.success(f"✅ Sent to {r['Phone']}")
+                    sent_phones.append(phone)
+                    st.success(f"✅ Sent to {phone}")
                 else:  
                     failed += 1
-                    st.error(f"❌ Failed for {r['Phone']}: {msg}")
-                time.sleep(1)
+                    st.error(f"❌ Failed for {phone}: {msg}")
             
             # NEW: Update deals in HubSpot after successful sends
             if sent_phones and st.session_state.get("reminders_phone_to_deals"):
                 st.info("Updating HubSpot deals...")
                 phone_to_deals = st.session_state["reminders_phone_to_deals"]
                 
-                all_deal_ids = []
-                for phone in sent_phones:
-                    if phone in phone_to_deals:
-                        all_deal_ids.extend(phone_to_deals[phone])
-                
-                if all_deal_ids:
-                    # Build mapping deal_id -> associate_email
-                    deal_to_email = {}
-                    for _, r in to_send.iterrows():
-                        phone = r["Phone"]
-                        associate_email = r.get("SalesEmail", "")
-                        user_id = r.get("SalesUserId")
-                        if phone in phone_to_deals:
-                            for deal_id in phone_to_deals[phone]:
-                                deal_to_email[deal_id] = user_id
+                # Only needs to know whether any successfully-sent phone has a deal; stop at the first.
+                if any(phone_to_deals.get(phone) for phone in sent_phones):
+                    # Build mapping deal_id -> associate user id: one map + explode over the
+                    # selected rows (phones without deals drop out), later rows win as before.
+                    user_ids = to_send["SalesUserId"] if "SalesUserId" in to_send.columns else None
+                    links = pd.DataFrame({"deal_id": to_send["Phone"].map(phone_to_deals), "user_id": user_ids},
+                                         index=to_send.index).dropna(subset=["deal_id"]).explode("deal_id")
+                    links = links[links["deal_id"].notna()]
+                    deal_to_email = dict(zip(links["deal_id"], links["user_id"]))
                     update_success, update_fail = update_deals_sms_sent(deal_to_email)
                     if update_success > 0:
                         st.success(f"✅ Updated {update_success} deals with SMS sent status")
@@ -11,6 +11,44 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# ChatGPT analyses in flight at once.
+UNSOLD_ANALYSIS_WORKERS = 8
+# Deals per page in the "Detailed View (Expandable)" section.
+UNSOLD_DETAIL_PAGE = 25
+# Category buttons shown before the long tail is folded into "Other".
+UNSOLD_TOP_CATEGORIES = 8
+
+
+def _analyze_unsold_deal(deal_row, notes: str, display_notes: str) -> dict:
+    """ChatGPT analysis for one deduped deal's notes; runs on a worker thread, so no st.* calls."""
+    deal_id = str(deal_row.get('hs_object_id', 'Unknown'))
+    customer_name = str(deal_row.get('full_name', 'Unknown Customer'))
+    vehicle = f"{deal_row.get('vehicle_make', '')} {deal_row.get('vehicle_model', '')}".strip() or "Unknown Vehicle"
+    
+    # Analyze with ChatGPT
+    try:
+        analysis = analyze_with_chatgpt(notes, customer_name, vehicle)
+    except Exception as e:
+        analysis = {
+            "summary": f"Analysis failed: {str(e)[:50]}...",
+            "category": "Analysis failed",
+            "next_steps": "Review manually"
+        }
+    
+    return {
+        "Deal ID": deal_id,
+        "Customer": customer_name,
+        "Vehicle": deal_row.get('all_vehicles', vehicle),  # Use combined vehicles
+        "Notes": display_notes,
+        "Summary": analysis.get("summary", "No summary"),
+        "Category": analysis.get("category", "Unknown"),
+        "Next Steps": analysis.get("next_steps", "No steps"),
+        "Deal Count": deal_row.get('deal_count', 1),
+        "TD Date": deal_row.get('conducted_date_local', 'Unknown')  # Add date for weekly breakdown
+    }
 
 
 def view_unsold_summary():
@@ -32,15 +70,11 @@ def view_unsold_summary():
             with c3: d2 = st.date_input("End date", value=today)
         
         # State filter
-        state_options = hs_get_deal_property_options("car_location_at_time_of_sale")
-        values = [o["value"] for o in state_options] if state_options else []
-        labels = [o["label"] for o in state_options] if state_options else []
-        def_val = "VIC" if "VIC" in values else (values[0] if values else "")
+        labels, label_to_val, def_idx, def_val = hs_state_select_options("car_location_at_time_of_sale")
         
         with c4:
             if labels:
-                chosen_label = st.selectbox("Vehicle state", labels, index=(values.index("VIC") if "VIC" in values else 0))
-                label_to_val = {o["label"]:o["value"] for o in state_options}
+                chosen_label = st.selectbox("Vehicle state", labels, index=def_idx)
                 state_val = label_to_val.get(chosen_label, def_val)
             else:
                 state_val = st.text_input("Vehicle state", value=def_val)
@@ -77,91 +111,67 @@ def view_unsold_summary():
                 deals_df = prepare_deals(raw_deals)
                 
                 # Dedupe deals by customer (email/phone combination)
-                deals_df["email_l"] = deals_df["email"].astype(str).str.strip().str.lower()
-                deals_df["user_key"] = (deals_df["phone_norm"].fillna('') + "|" + deals_df["email_l"].fillna('')).str.strip()
-                deals_df = deals_df[deals_df["user_key"].astype(bool)]
+                # phone_norm/email_l come out of prepare_deals as Arrow strings, already normalised and
+                # stripped: one str.cat builds the key, and as it always contains "|" no row has an empty key.
+                deals_df["user_key"] = deals_df["phone_norm"].fillna('').str.cat(deals_df["email_l"].fillna(''), sep="|")
                 
-                # Keep first deal per customer and collect all vehicles
-                dedupe_results = []
-                for user_key, group in deals_df.groupby("user_key"):
-                    # Take first deal as primary
-                    primary_deal = group.iloc[0]
-                    
-                    # Collect all vehicles and appointment_ids for this customer
-                    vehicles_info = []
-                    for _, deal_row in group.iterrows():
-                        vehicle_make = deal_row.get('vehicle_make', '')
-                        vehicle_model = deal_row.get('vehicle_model', '')
-                        appointment_id = deal_row.get('appointment_id', '')
-                        vehicle_info = f"{vehicle_make} {vehicle_model}".strip()
-                        if appointment_id:
-                            vehicle_info += f" (ID: {appointment_id})"
-                        vehicles_info.append(vehicle_info)
-                    
-                    # Create combined record
-                    combined_deal = primary_deal.copy()
-                    combined_deal['all_vehicles'] = " | ".join(vehicles_info)
-                    combined_deal['deal_count'] = len(group)
-                    dedupe_results.append(combined_deal)
+                # Keep first deal per customer (customers in user_key order) and collect all vehicles
+                # and appointment_ids: one label per deal, joined per customer by a groupby.
+                n = len(deals_df)
+                makes = deals_df["vehicle_make"].tolist() if "vehicle_make" in deals_df.columns else [''] * n
+                models = deals_df["vehicle_model"].tolist() if "vehicle_model" in deals_df.columns else [''] * n
+                appts = deals_df["appointment_id"].tolist() if "appointment_id" in deals_df.columns else [''] * n
+                vehicle_info = pd.Series(
+                    [f"{make} {model}".strip() + (f" (ID: {appt})" if appt else "") for make, model, appt in zip(makes, models, appts)],
+                    index=deals_df.index, dtype=object,
+                )
+                by_customer = vehicle_info.groupby(deals_df["user_key"], sort=True)
+                all_vehicles, deal_count = by_customer.agg(" | ".join), by_customer.size()
                 
-                deals_df = pd.DataFrame(dedupe_results)
+                deals_df = deals_df.drop_duplicates("user_key").sort_values("user_key", kind="stable")
+                deals_df = deals_df.assign(
+                    all_vehicles=deals_df["user_key"].map(all_vehicles),
+                    deal_count=deals_df["user_key"].map(deal_count),
+                )
                 
                 if deals_df.empty:
                     st.info("No deals found after processing.")
                     return
                 
-                # Process each deal
-                results = []
+                # Consolidated notes for every deal in batched HubSpot calls
+                rows = [row for _, row in deals_df.iterrows()]
+                deal_ids = [str(row.get('hs_object_id', 'Unknown')) for row in rows]
+                try:
+                    notes_map = get_consolidated_notes_for_deals(deal_ids)
+                except Exception as e:
+                    notes_map = dict.fromkeys(deal_ids, f"Error getting notes: {str(e)}")
+                notes_s = pd.Series(notes_map, dtype=object).reindex(deal_ids).fillna("No notes")
+                notes_s = notes_s.where(notes_s.str.strip() != "", "No notes")
+                # Display form: first 300 chars, newline runs shown as " | "
+                display_s = notes_s.str.slice(0, 300).where(notes_s.str.len() <= 300, notes_s.str.slice(0, 300) + "...")
+                display_s = display_s.str.replace(r"\n+", " | ", regex=True)
+                
+                # Process each deal: ChatGPT calls are network-bound, so deals overlap on a small
+                # pool; progress is reported here on the Streamlit thread, results keep deal order.
+                results = [None] * len(rows)
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                for i, (_, deal_row) in enumerate(deals_df.iterrows()):
-                    deal_id = str(deal_row.get('hs_object_id', 'Unknown'))
-                    customer_name = str(deal_row.get('full_name', 'Unknown Customer'))
-                    vehicle = f"{deal_row.get('vehicle_make', '')} {deal_row.get('vehicle_model', '')}".strip() or "Unknown Vehicle"
-                    
-                    status_text.text(f"Processing {i+1}/{len(deals_df)}: {customer_name}")
-                    progress_bar.progress((i + 1) / len(deals_df))
-                    
-                    # Get consolidated notes
-                    try:
-                        notes = get_consolidated_notes_for_deal(deal_id)
-                        if not notes or notes.strip() == "" or notes == "No notes":
-                            notes = "No notes"
-                    except Exception as e:
-                        notes = f"Error getting notes: {str(e)}"
-                    
-                    # Analyze with ChatGPT
-                    try:
-                        analysis = analyze_with_chatgpt(notes, customer_name, vehicle)
-                    except Exception as e:
-                        analysis = {
-                            "summary": f"Analysis failed: {str(e)[:50]}...",
-                            "category": "Analysis failed",
-                            "next_steps": "Review manually"
-                        }
-                    
-                    # Format notes for display with line breaks
-                    display_notes = notes[:300] + "..." if len(notes) > 300 else notes
-                    display_notes = display_notes.replace('\n\n', '\n').replace('\n', ' | ')
-                    
-                    results.append({
-                        "Deal ID": deal_id,
-                        "Customer": customer_name,
-                        "Vehicle": deal_row.get('all_vehicles', vehicle),  # Use combined vehicles
-                        "Notes": display_notes,
-                        "Summary": analysis.get("summary", "No summary"),
-                        "Category": analysis.get("category", "Unknown"),
-                        "Next Steps": analysis.get("next_steps", "No steps"),
-                        "Deal Count": deal_row.get('deal_count', 1),
-                        "TD Date": deal_row.get('conducted_date_local', 'Unknown')  # Add date for weekly breakdown
-                    })
+                with ThreadPoolExecutor(max_workers=UNSOLD_ANALYSIS_WORKERS) as ex:
+                    futures = {ex.submit(_analyze_unsold_deal, row, notes, display): i
+                               for i, (row, notes, display) in enumerate(zip(rows, notes_s.tolist(), display_s.tolist()))}
+                    for done, fut in enumerate(as_completed(futures), start=1):
+                        i = futures[fut]
+                        results[i] = fut.result()
+                        status_text.text(f"Processed {done}/{len(rows)}: {results[i]['Customer']}")
+                        progress_bar.progress(done / len(rows))
                 
                 progress_bar.empty()
                 status_text.empty()
                 
                 # Store results
                 st.session_state["unsold_results"] = results
+                st.session_state.pop("unsold_detail_shown", None)  # new results start at the first page
                 st.success(f"Successfully analyzed {len(results)} deals!")
                 
             except Exception as e:
@@ -197,7 +207,9 @@ def view_unsold_summary():
         st.markdown("---")
         st.markdown("#### Detailed View (Expandable)")
         
-        for i, result in enumerate(results):
+        # Expanders are all serialised to the browser even when collapsed, so render them a page at a time.
+        shown = min(len(results), st.session_state.get("unsold_detail_shown", UNSOLD_DETAIL_PAGE))
+        for i, result in enumerate(results[:shown]):
             with st.expander(f"{result['Customer']} - {result['Vehicle']} - {result['Category']}"):
                 col1, col2 = st.columns([1, 1])
                 with col1:
@@ -210,14 +222,21 @@ def view_unsold_summary():
                     st.write(f"**Next Steps:** {result['Next Steps']}")
                 st.write(f"**Full Notes:**")
                 st.text_area("", value=result['Notes'].replace(' | ', '\n'), height=150, key=f"notes_{i}", disabled=True)
+        if shown < len(results):
+            if st.button(f"Show next {min(UNSOLD_DETAIL_PAGE, len(results) - shown)} of {len(results) - shown} remaining", key="unsold_detail_more"):
+                st.session_state["unsold_detail_shown"] = shown + UNSOLD_DETAIL_PAGE
+                st.rerun()
         
         # Category breakdown with weekly analysis and clickable categories
         if len(results) > 1:
             st.markdown("#### Category Breakdown by Week")
             
             # Prepare data for weekly breakdown
-            results_df['TD Date'] = pd.to_datetime([r.get('TD Date', 'Unknown') for r in results], errors='coerce')
-            results_df['Week Starting'] = results_df['TD Date'].dt.to_period('W-MON').dt.start_time.dt.date
+            results_df['TD Date'] = pd.to_datetime(results_df['TD Date'], errors='coerce')
+            # Same buckets as to_period('W-MON').start_time (weeks ending Monday, so starting Tuesday)
+            # without materialising a PeriodArray: step back to the previous Tuesday.
+            td = results_df['TD Date']
+            results_df['Week Starting'] = (td - pd.to_timedelta((td.dt.weekday - 1) % 7, unit="D")).dt.normalize().dt.date
             
             # Create weekly breakdown
             weekly_breakdown = results_df.groupby(['Week Starting', 'Category']).size().unstack(fill_value=0)
@@ -233,13 +252,20 @@ def view_unsold_summary():
             # Clickable category buttons
             st.markdown("#### Click on a category to see details:")
             
-            categories = results_df["Category"].value_counts()
-            cols = st.columns(min(len(categories), 4))
+            counts = results_df["Category"].value_counts()
+            top = counts.head(UNSOLD_TOP_CATEGORIES)
+            # Noisy ChatGPT categories can be mostly one-offs; fold the tail into one "Other" button.
+            buttons = [(category, count, (category,)) for category, count in top.items()]
+            if len(counts) > len(top):
+                tail = counts.iloc[len(top):]
+                buttons.append(("Other", int(tail.sum()), tuple(tail.index)))
+            cols = st.columns(min(len(buttons), 4))
             
-            for i, (category, count) in enumerate(categories.items()):
+            for i, (category, count, members) in enumerate(buttons):
                 with cols[i % 4]:
                     if st.button(f"{category} ({count})", key=f"cat_{i}"):
                         st.session_state["selected_category"] = category
+                        st.session_state["selected_category_members"] = members
         
         # Display selected category details
         if "selected_category" in st.session_state:
@@ -247,31 +273,17 @@ def view_unsold_summary():
             st.markdown(f"#### Details for: {selected_cat}")
             
             # Filter results for selected category
-            cat_results = [r for r in results if r["Category"] == selected_cat]
+            members = st.session_state.get("selected_category_members", (selected_cat,))
+            cat_df = results_df.loc[results_df["Category"].isin(members)]
             
             # Create detailed table
-            detailed_data = []
-            for result in cat_results:
-                # Format the test drive date
-                td_date = result.get("TD Date", "Unknown")
-                if pd.notna(td_date) and td_date != "Unknown":
-                    try:
-                        if isinstance(td_date, str):
-                            td_date = pd.to_datetime(td_date).strftime("%d %b %Y")
-                        else:
-                            td_date = td_date.strftime("%d %b %Y")
-                    except:
-                        td_date = str(td_date)
-                
-                detailed_data.append({
-                    "Customer": result["Customer"],
-                    "TD Date": td_date,
-                    "Vehicles & IDs": result["Vehicle"],
-                    "Notes Summary": result["Summary"],
-                    "Next Steps": result["Next Steps"]
-                })
-            
-            detailed_df = pd.DataFrame(detailed_data)
+            detailed_df = pd.DataFrame({
+                "Customer": cat_df["Customer"],
+                "TD Date": pd.to_datetime(cat_df["TD Date"], errors="coerce").dt.strftime("%d %b %Y").fillna("Unknown"),
+                "Vehicles & IDs": cat_df["Vehicle"],
+                "Notes Summary": cat_df["Summary"],
+                "Next Steps": cat_df["Next Steps"],
+            })
             st.dataframe(
                 detailed_df, 
                 use_container_width=True, 
@@ -287,6 +299,7 @@ def view_unsold_summary():
             
             if st.button("Clear Selection", key="clear_cat"):
                 del st.session_state["selected_category"]
+                st.session_state.pop("selected_category_members", None)
                 st.rerun()
 
 # ============ Rendering helpers ============